@@ -1,17 +1,41 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, abort
-from models import db, WeeklyWorkout, WorkoutTemplate, Exercise, User
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, abort, jsonify
+from models import db, WeeklyWorkout, WeeklyWorkoutDay, WorkoutTemplate, Exercise
 from sqlalchemy import func
+from sqlalchemy.orm import selectinload
 from datetime import datetime, timedelta
 from extensions import db
+from leaderboard_cache import leaderboard_cache
+from schedule_cache import schedule_cache
+from current_user import get_current_user_summary
 
 admin = Blueprint('admin', __name__)
 
+# (weekday, form name) in the order the schedule forms show them; weeks start on Sunday
+SCHEDULE_DAYS = [(6, 'sunday'), (0, 'monday'), (1, 'tuesday'), (2, 'wednesday'),
+                 (3, 'thursday'), (4, 'friday'), (5, 'saturday')]
+WEEKS_PER_PAGE = 20
+
+
+def parse_schedule(form):
+    """Read {weekday: template_id} from a schedule form; blank and 'rest' days are left out."""
+    schedule = {}
+    for weekday, day in SCHEDULE_DAYS:
+        template_id = form.get(f'{day}_template')
+        if template_id and template_id != 'rest':
+            schedule[weekday] = int(template_id)
+    return schedule
+
+
+def _with_schedule(query):
+    # One query for the weeks' days and their templates, however many weeks are loaded
+    return query.options(selectinload(WeeklyWorkout.days).joinedload(WeeklyWorkoutDay.template))
+
 @admin.route('/create_weekly_workout', methods=['GET', 'POST'])
 def create_weekly_workout():
     if 'user_id' not in session:
         abort(403)  # Forbidden
     
-    user = db.session.get(User, session['user_id'])
+    user = get_current_user_summary()
     if not user or not user.is_admin:
         abort(403)  # Forbidden
 
@@ -20,14 +44,7 @@ def create_weekly_workout():
         # Normalize to Sunday
         week_start_date -= timedelta(days=week_start_date.weekday() + 1)
         weekly_workout = WeeklyWorkout(week_start_date=week_start_date)
-
-        days = ['sunday', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday']
-        for day in days:
-            template_id = request.form.get(f'{day}_template')
-            if template_id == 'rest':
-                setattr(weekly_workout, f'{day}_template_id', None)
-            elif template_id:
-                setattr(weekly_workout, f'{day}_template_id', template_id)
+        weekly_workout.set_schedule(parse_schedule(request.form))
 
         db.session.add(weekly_workout)
         db.session.commit()
@@ -35,26 +52,31 @@ def create_weekly_workout():
         return redirect(url_for('admin.view_weekly_workouts'))
 
     templates = WorkoutTemplate.query.all()
-    return render_template('admin/create_weekly_workout.html', templates=templates)
+    return render_template('admin/create_weekly_workout.html', templates=templates, days=SCHEDULE_DAYS)
 
 @admin.route('/view_weekly_workouts')
 def view_weekly_workouts():
     if 'user_id' not in session:
         abort(403)  # Forbidden
     
-    user = db.session.get(User, session['user_id'])
+    user = get_current_user_summary()
     if not user or not user.is_admin:
         abort(403)  # Forbidden
 
-    weekly_workouts = WeeklyWorkout.query.order_by(WeeklyWorkout.week_start_date.desc()).all()
-    return render_template('admin/view_weekly_workouts.html', weekly_workouts=weekly_workouts)
+    page = max(request.args.get('page', 1, type=int), 1)
+    weekly_workouts = _with_schedule(WeeklyWorkout.query).order_by(
+        WeeklyWorkout.week_start_date.desc(), WeeklyWorkout.id.desc()
+    ).offset((page - 1) * WEEKS_PER_PAGE).limit(WEEKS_PER_PAGE + 1).all()
+    has_next = len(weekly_workouts) > WEEKS_PER_PAGE
+    return render_template('admin/view_weekly_workouts.html', weekly_workouts=weekly_workouts[:WEEKS_PER_PAGE],
+                           days=SCHEDULE_DAYS, page=page, has_next=has_next)
 
 @admin.route('/view_template/<int:template_id>')
 def view_template(template_id):
     if 'user_id' not in session:
         abort(403)  # Forbidden
     
-    user = db.session.get(User, session['user_id'])
+    user = get_current_user_summary()
     if not user or not user.is_admin:
         abort(403)  # Forbidden
 
@@ -68,7 +90,7 @@ def edit_weekly_workout(workout_id):
     if 'user_id' not in session:
         abort(403)  # Forbidden
     
-    user = db.session.get(User, session['user_id'])
+    user = get_current_user_summary()
     if not user or not user.is_admin:
         abort(403)  # Forbidden
 
@@ -80,33 +102,49 @@ def edit_weekly_workout(workout_id):
 
     if request.method == 'POST':
         workout.week_start_date = datetime.strptime(request.form['week_start_date'], '%Y-%m-%d').date()
-        days = ['sunday', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday']
-        for day in days:
-            template_id = request.form.get(f'{day}_template')
-            if template_id == 'rest':
-                setattr(workout, f'{day}_template_id', None)
-            elif template_id:
-                setattr(workout, f'{day}_template_id', int(template_id))
-            else:
-                setattr(workout, f'{day}_template_id', None)
+        workout.set_schedule(parse_schedule(request.form))
 
         db.session.commit()
         flash('Weekly workout updated successfully!', 'success')
         return redirect(url_for('admin.view_weekly_workouts'))
 
-    return render_template('admin/edit_weekly_workout.html', workout=workout, templates=templates)
+    return render_template('admin/edit_weekly_workout.html', workout=workout, templates=templates, days=SCHEDULE_DAYS)
 
 @admin.route('/view_weekly_workout/<int:workout_id>')
 def view_weekly_workout(workout_id):
     if 'user_id' not in session:
         abort(403)  # Forbidden
     
-    user = db.session.get(User, session['user_id'])
+    user = get_current_user_summary()
     if not user or not user.is_admin:
         abort(403)  # Forbidden
 
-    workout = db.session.get(WeeklyWorkout, workout_id)
+    workout = _with_schedule(WeeklyWorkout.query).filter_by(id=workout_id).first()
     if not workout:
         abort(404)  # Not Found
 
-    return render_template('admin/view_weekly_workout.html', workout=workout)
+    return render_template('admin/view_weekly_workout.html', workout=workout, days=SCHEDULE_DAYS)
+
+
+@admin.route('/leaderboard_cache_stats')
+def leaderboard_cache_stats():
+    if 'user_id' not in session:
+        abort(403)  # Forbidden
+    
+    user = get_current_user_summary()
+    if not user or not user.is_admin:
+        abort(403)  # Forbidden
+
+    return jsonify(leaderboard_cache.stats())
+
+
+@admin.route('/schedule_cache_stats')
+def schedule_cache_stats():
+    if 'user_id' not in session:
+        abort(403)  # Forbidden
+    
+    user = get_current_user_summary()
+    if not user or not user.is_admin:
+        abort(403)  # Forbidden
+
+    return jsonify(schedule_cache.stats())
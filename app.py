@@ -1,18 +1,32 @@
 from flask import Flask, render_template, request, redirect, url_for, flash, session, abort, jsonify
-from datetime import datetime, timedelta
-from sqlalchemy import func
+from datetime import datetime
+import hmac
+from sqlalchemy import func, insert, or_, and_
+from sqlalchemy.orm import selectinload, joinedload
 import os
 from dotenv import load_dotenv
 import logging
-from stravalib.client import Client
-from stravalib.exc import AccessUnauthorized
-from werkzeug.utils import secure_filename
-from PIL import Image
-from s3_utils import upload_file_to_s3, delete_file_from_s3
-from flask import current_app
+import click
 from config import DevelopmentConfig, ProductionConfig, TestingConfig
 from workout_templates import workout_templates
-from models import User, Workout, Set, Exercise, StravaWorkout, StravaAccount, WeeklyWorkout, WorkoutTemplate
+from models import User, Workout, Set, StravaWorkout, StravaAccount, WorkoutTemplate, DailyVolume, Job, PersonalRecord
+from volume_rollup import refresh_daily_volume, rebuild_daily_volume
+from personal_records import refresh_personal_records, rebuild_personal_records, top_records, RECORD_METRICS
+from leaderboard_cache import leaderboard_cache, period_start
+from cache_versions import bump_cache_version
+from exercise_catalog import exercise_catalog
+from schedule_cache import schedule_cache
+from current_user import get_current_user, get_current_user_summary
+from bootstrap import bootstrap_database, seed_exercises
+from jobs import work, work_in_threads
+from strava_sync import enqueue_strava_import, enqueue_strava_backfill, handle_webhook_event
+from strava_tokens import get_strava_client, oauth_client
+from profile_pictures import (MAX_PROFILE_PICTURE_BYTES, upload_size, is_image, stash_upload,
+                              enqueue_profile_picture, enqueue_avatar_sweep, sweep_orphaned_avatars,
+                              avatar_sources, DEFAULT_AVATAR_URL)
+from query_plans import find_sequential_scans
+from scoring import ranked_roster
+from batch_scoring import compute_strength_scores
 from extensions import db, init_db
 from werkzeug.security import generate_password_hash, check_password_hash
 from admin import admin as admin_blueprint
@@ -42,8 +56,13 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
 app.config['STRAVA_CLIENT_ID'] = os.getenv('STRAVA_CLIENT_ID')
 app.config['STRAVA_CLIENT_SECRET'] = os.getenv('STRAVA_CLIENT_SECRET')
 app.config['STRAVA_REDIRECT_URI'] = os.getenv('STRAVA_REDIRECT_URI', 'http://localhost:5000/strava/callback')
+app.config['STRAVA_WEBHOOK_VERIFY_TOKEN'] = os.getenv('STRAVA_WEBHOOK_VERIFY_TOKEN')
+app.config['STRAVA_WEBHOOK_SUBSCRIPTION_ID'] = os.getenv('STRAVA_WEBHOOK_SUBSCRIPTION_ID')
 
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'profile_pictures')
+# Werkzeug rejects larger request bodies while reading them (or up front from Content-Length);
+# the margin leaves room for the multipart framing around a picture at the size limit
+app.config['MAX_CONTENT_LENGTH'] = MAX_PROFILE_PICTURE_BYTES + 64 * 1024
 
 init_db(app)
 
@@ -55,18 +74,8 @@ def index():
     user = None
     suggested_workout = None
     if 'user_id' in session:
-        user = User.query.get(session['user_id'])
-        today = datetime.now()
-        day_of_week = today.strftime('%A').lower()  # e.g., 'monday', 'tuesday', etc.
-        
-        # Find the most recent weekly workout
-        latest_weekly_workout = WeeklyWorkout.query.order_by(WeeklyWorkout.week_start_date.desc()).first()
-        
-        if latest_weekly_workout:
-            # Get the template for today
-            template_id = getattr(latest_weekly_workout, f'{day_of_week}_template_id')
-            if template_id:
-                suggested_workout = WorkoutTemplate.query.get(template_id)
+        user = get_current_user_summary()
+        suggested_workout = schedule_cache.suggested_workout(datetime.now().date())
     
     return render_template('index.html', user=user, suggested_workout=suggested_workout)
 
@@ -113,10 +122,37 @@ def logout():
     flash('You have been logged out')
     return redirect(url_for('index'))
 
+def parse_set_entries(form):
+    """Read the numbered exercise entries posted by the workout forms.
+
+    Raises ValueError, with a message for the user, for an entry that isn't
+    a number or has fewer than one set or rep.
+    """
+    entries = []
+    for i in range(1, int(form['exercise_count']) + 1):
+        # Entries removed in the form leave gaps in the numbering
+        if f'exercise_{i}' not in form:
+            continue
+        try:
+            entry = {
+                'set_id': form.get(f'set_id_{i}', type=int),
+                'exercise_id': int(form[f'exercise_{i}']),
+                'weight': float(form[f'weight_{i}']),
+                'reps': int(form[f'reps_{i}']),
+                'set_count': int(form[f'sets_{i}']),
+            }
+        except ValueError:
+            raise ValueError(f'Exercise {len(entries) + 1}: sets, reps and weight must be numbers')
+        # A grouped row with no sets would still count towards records and volume
+        if entry['set_count'] < 1 or entry['reps'] < 1:
+            raise ValueError(f'Exercise {len(entries) + 1}: sets and reps must be at least 1')
+        entries.append(entry)
+    return entries
+
 @app.route('/add_workout', methods=['GET', 'POST'])
 def add_workout():
     if request.method == 'GET':
-        exercises = Exercise.query.all()
+        exercises = exercise_catalog.exercises()
         templates = WorkoutTemplate.query.all()
         return render_template('add_workout.html', exercises=exercises, templates=templates)
     
@@ -128,31 +164,32 @@ def add_workout():
         date_str = request.form['date']
         date = datetime.strptime(date_str, '%Y-%m-%d').date()
         
-        user_id = session.get('user_id')
-        if user_id is None:
-            flash('User not found. Please log in again.')
-            return redirect(url_for('login'))
-        
-        user = User.query.get(user_id)
+        user = get_current_user()
         if user is None:
             flash('User not found. Please log in again.')
             return redirect(url_for('login'))
         
-        workout = Workout(user_id=user.id, date=date)
-        db.session.add(workout)
-        
-        exercise_count = int(request.form['exercise_count'])
-        for i in range(1, exercise_count + 1):
-            exercise_id = request.form[f'exercise_{i}']
-            sets = int(request.form[f'sets_{i}'])
-            reps = int(request.form[f'reps_{i}'])
-            weight = float(request.form[f'weight_{i}'])
-            
-            for _ in range(sets):
-                set = Set(workout=workout, exercise_id=exercise_id, weight=weight, reps=reps)
-                db.session.add(set)
+        try:
+            entries = parse_set_entries(request.form)
+        except ValueError as e:
+            flash(str(e))
+            return redirect(url_for('add_workout'))
         
         try:
+            workout = Workout(user_id=user.id, date=date)
+            db.session.add(workout)
+            db.session.flush()
+            
+            # Insert every set in one executemany instead of one INSERT each
+            set_rows = []
+            for entry in entries:
+                entry.pop('set_id')
+                set_rows.append(dict(entry, workout_id=workout.id))
+            if set_rows:
+                db.session.execute(insert(Set), set_rows)
+            
+            refresh_daily_volume(user.id, [date])
+            refresh_personal_records(user.id, {row['exercise_id'] for row in set_rows})
             db.session.commit()
             flash('Workout added successfully')
             return redirect(url_for('index'))
@@ -168,52 +205,91 @@ def leaderboard():
     muscle_group = request.args.get('muscle_group', '')
     time_period = request.args.get('time_period', 'all')
     
-    base_query = db.session.query(
-        User.username, 
-        func.sum(Set.weight * Set.reps).label('total_volume')
-    ).select_from(User).join(User.workouts).join(Workout.sets).join(Set.exercise)
-    
-    if muscle_group:
-        base_query = base_query.filter(Exercise.muscle_group == muscle_group)
-    
     # Apply time period filter
     today = datetime.now().date()
-    if time_period == 'week':
-        start_date = today - timedelta(days=today.weekday())
-        base_query = base_query.filter(Workout.date >= start_date)
-    elif time_period == 'month':
-        start_date = today.replace(day=1)
-        base_query = base_query.filter(Workout.date >= start_date)
-    elif time_period == 'year':
-        start_date = today.replace(month=1, day=1)
-        base_query = base_query.filter(Workout.date >= start_date)
-    
-    leaderboard = base_query.group_by(User.id).order_by(func.sum(Set.weight * Set.reps).desc()).all()
+    start_date = period_start(time_period, today)
+    cache_period = time_period if start_date else 'all'
+    
+    def load_leaderboard():
+        base_query = db.session.query(
+            User.id,
+            User.username, 
+            func.sum(DailyVolume.total_volume).label('total_volume')
+        ).select_from(User).join(DailyVolume, DailyVolume.user_id == User.id)
+        
+        if muscle_group:
+            base_query = base_query.filter(DailyVolume.muscle_group == muscle_group)
+        if start_date:
+            base_query = base_query.filter(DailyVolume.date >= start_date)
+        
+        return base_query.group_by(User.id).order_by(func.sum(DailyVolume.total_volume).desc()).all()
     
-    muscle_groups = db.session.query(Exercise.muscle_group).distinct().all()
-    muscle_groups = [group[0] for group in muscle_groups]
+    muscle_groups = exercise_catalog.muscle_groups()
+    # Only known groups get cache entries; otherwise any query string would add one
+    if muscle_group and muscle_group not in muscle_groups:
+        leaderboard = load_leaderboard()
+    else:
+        leaderboard = leaderboard_cache.get_results(muscle_group, cache_period, start_date, load_leaderboard)
+    # Picture changes don't bump the leaderboard version, so look them up fresh
+    profile_pictures = dict(db.session.query(User.id, User.profile_picture).filter(
+        User.id.in_([entry.id for entry in leaderboard]))) if leaderboard else {}
     
     return render_template('leaderboard.html', 
                            leaderboard=leaderboard, 
+                           profile_pictures=profile_pictures, 
                            muscle_groups=muscle_groups, 
                            selected_group=muscle_group,
                            selected_period=time_period)
 
+WORKOUTS_PER_PAGE = 20
+
 @app.route('/user_profile')
 def user_profile():
     if 'user_id' not in session:
         flash('Please log in to view your profile.', 'warning')
         return redirect(url_for('login'))
     
-    user = User.query.get(session['user_id'])
-    workouts = Workout.query.filter_by(user_id=user.id).order_by(Workout.date.desc()).all()
+    user = get_current_user()
+    
+    # Keyset pagination: each page starts after the (date, id) of the last workout shown
+    workouts_query = Workout.query.options(
+        selectinload(Workout.sets).joinedload(Set.exercise)
+    ).filter_by(user_id=user.id)
+    before_date = request.args.get('before', type=lambda value: datetime.strptime(value, '%Y-%m-%d').date())
+    before_id = request.args.get('before_id', type=int)
+    if before_date and before_id:
+        workouts_query = workouts_query.filter(or_(
+            Workout.date < before_date,
+            and_(Workout.date == before_date, Workout.id < before_id)
+        ))
+    workouts = workouts_query.order_by(Workout.date.desc(), Workout.id.desc()).limit(WORKOUTS_PER_PAGE + 1).all()
+    has_older = len(workouts) > WORKOUTS_PER_PAGE
+    workouts = workouts[:WORKOUTS_PER_PAGE]
+    
     strava_workouts = StravaWorkout.query.filter_by(user_id=user.id).order_by(StravaWorkout.start_date.desc()).all()
-    strava_connected = StravaAccount.query.filter_by(user_id=user.id).first() is not None
+    strava_account = StravaAccount.query.filter_by(user_id=user.id).first()
+    strava_connected = strava_account is not None
+    strava_import_job = Job.query.filter(
+        Job.user_id == user.id,
+        Job.kind.in_(['strava_import', 'strava_backfill'])
+    ).order_by(Job.id.desc()).first()
+    profile_picture_job = Job.query.filter(
+        Job.user_id == user.id,
+        Job.kind == 'profile_picture'
+    ).order_by(Job.id.desc()).first()
+    personal_records = PersonalRecord.query.options(joinedload(PersonalRecord.exercise)).filter_by(
+        user_id=user.id).all()
+    personal_records.sort(key=lambda record: record.exercise.name)
     
     profile_picture_url = url_for('static', filename=f'profile_pictures/{user.profile_picture}') if user.profile_picture else None
     
-    return render_template('user_profile.html', user=user, workouts=workouts, 
+    return render_template('user_profile.html', user=user, workouts=workouts, has_older=has_older,
+                           is_first_page=before_id is None,
                            strava_workouts=strava_workouts, strava_connected=strava_connected,
+                           strava_account=strava_account,
+                           strava_import_job=strava_import_job,
+                           profile_picture_job=profile_picture_job,
+                           personal_records=personal_records,
                            profile_picture_url=profile_picture_url)
 
 @app.route('/edit_workout/<int:workout_id>', methods=['GET', 'POST'])
@@ -226,25 +302,47 @@ def edit_workout(workout_id):
     if workout.user_id != session['user_id']:
         abort(403)
     
-    exercises = Exercise.query.all()
+    exercises = exercise_catalog.exercises()
     
     if request.method == 'POST':
-        workout.date = datetime.strptime(request.form['date'], '%Y-%m-%d').date()
+        try:
+            entries = parse_set_entries(request.form)
+        except ValueError as e:
+            flash(str(e))
+            return redirect(url_for('edit_workout', workout_id=workout.id))
         
-        # Remove existing sets
-        for set in workout.sets:
-            db.session.delete(set)
+        old_date = workout.date
+        new_date = datetime.strptime(request.form['date'], '%Y-%m-%d').date()
+        changed = new_date != old_date
+        workout.date = new_date
         
-        # Add new sets
-        for i in range(1, int(request.form['set_count']) + 1):
-            exercise_id = request.form[f'exercise_{i}']
-            weight = float(request.form[f'weight_{i}'])
-            reps = int(request.form[f'reps_{i}'])
-            
-            set = Set(workout=workout, exercise_id=exercise_id, weight=weight, reps=reps)
-            db.session.add(set)
+        # Diff the posted entries against the stored rows so only changed rows are written
+        existing_sets = {set.id: set for set in workout.sets}
+        # Records for exercises dropped from the workout need recomputing too
+        record_exercise_ids = {set.exercise_id for set in workout.sets}
+        new_rows = []
+        for entry in entries:
+            record_exercise_ids.add(entry['exercise_id'])
+            set = existing_sets.pop(entry.pop('set_id'), None)
+            if set is None:
+                new_rows.append(dict(entry, workout_id=workout.id))
+                continue
+            for field, value in entry.items():
+                if getattr(set, field) != value:
+                    setattr(set, field, value)
+                    changed = True
         
         try:
+            if existing_sets:
+                Set.query.filter(Set.id.in_(list(existing_sets))).delete(synchronize_session=False)
+                changed = True
+            if new_rows:
+                db.session.execute(insert(Set), new_rows)
+                changed = True
+            
+            if changed:
+                refresh_daily_volume(workout.user_id, [old_date, new_date])
+                refresh_personal_records(workout.user_id, record_exercise_ids)
             db.session.commit()
             flash('Workout updated successfully')
             return redirect(url_for('user_profile'))
@@ -267,7 +365,10 @@ def delete_workout(workout_id):
         return redirect(url_for('user_profile'))
 
     try:
+        record_exercise_ids = {set.exercise_id for set in workout.sets}
         db.session.delete(workout)
+        refresh_daily_volume(workout.user_id, [workout.date])
+        refresh_personal_records(workout.user_id, record_exercise_ids)
         db.session.commit()
         flash('Workout deleted successfully')
     except Exception as e:
@@ -276,40 +377,107 @@ def delete_workout(workout_id):
 
     return redirect(url_for('user_profile'))
 
-def populate_exercises():
-    exercises = [
-        ('Bench Press', 'Chest'),
-        ('Squat', 'Legs'),
-        ('Deadlift', 'Back'),
-        ('Overhead Press', 'Shoulders'),
-        ('Bicep Curl', 'Arms'),
-        ('Tricep Extension', 'Arms'),
-        ('Lat Pulldown', 'Back'),
-        ('Leg Press', 'Legs'),
-        ('Dumbbell Fly', 'Chest'),
-        ('Calf Raise', 'Legs')
-    ]
-    
-    for name, muscle_group in exercises:
-        exercise = Exercise.query.filter_by(name=name).first()
-        if not exercise:
-            new_exercise = Exercise(name=name, muscle_group=muscle_group)
-            db.session.add(new_exercise)
-    
-    db.session.commit()
+@app.cli.command('bootstrap')
+def bootstrap_command():
+    """Create or migrate a local development database and seed the exercise catalog."""
+    bootstrap_database()
+    print("Database bootstrapped")
+
+@app.cli.command('seed-exercises')
+def seed_exercises_command():
+    """Insert any missing seed exercises (the release phase runs this after migrating)."""
+    seed_exercises()
+    print("Exercise catalog seeded")
+
+@app.cli.command('run-worker')
+@click.option('--once', is_flag=True, help='Run the jobs that are due and exit.')
+@click.option('--threads', default=1, show_default=True, help='Number of jobs to run at the same time.')
+def run_worker_command(once, threads):
+    """Process background jobs (Strava imports) until stopped."""
+    if threads > 1:
+        work_in_threads(threads, once=once)
+    else:
+        work(once=once)
+
+@app.cli.command('rebuild-volume-rollup')
+def rebuild_volume_rollup_command():
+    """Recreate the leaderboard volume rollup from the raw sets."""
+    row_count = rebuild_daily_volume()
+    print(f"Rebuilt volume rollup: {row_count} rows")
+
+@app.cli.command('rebuild-personal-records')
+def rebuild_personal_records_command():
+    """Recreate every user's personal records from the raw sets."""
+    row_count = rebuild_personal_records()
+    print(f"Rebuilt personal records: {row_count} rows")
+
+@app.cli.command('compute-strength-scores')
+@click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Rolling window: score only sets logged on or after this date. '
+                   'Pairs with no sets in the window lose their score.')
+def compute_strength_scores_command(since):
+    """Rebuild every user's per-exercise relative strength scores from scratch."""
+    row_count = compute_strength_scores(since.date() if since else None)
+    print(f"Computed {row_count} strength scores")
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if a hot query would scan a whole table instead of using an index."""
+    failures = find_sequential_scans()
+    for name, plan in failures.items():
+        print(f"Sequential scan in '{name}':")
+        for line in plan:
+            print(f"    {line}")
+    if failures:
+        raise SystemExit(1)
+    print("All hot queries use an index")
+
+@app.cli.command('sweep-avatars')
+def sweep_avatars_command():
+    """Delete stored avatars that no user points at any more."""
+    removed = sweep_orphaned_avatars()
+    print(f"Removed {removed} orphaned avatar files")
+
+@app.cli.command('strava-subscribe')
+@click.argument('callback_url')
+def strava_subscribe_command(callback_url):
+    """Register CALLBACK_URL (the /strava/webhook route) for Strava push events."""
+    subscription = oauth_client().create_subscription(
+        client_id=app.config['STRAVA_CLIENT_ID'],
+        client_secret=app.config['STRAVA_CLIENT_SECRET'],
+        callback_url=callback_url,
+        verify_token=app.config['STRAVA_WEBHOOK_VERIFY_TOKEN']
+    )
+    print(f"Subscribed; set STRAVA_WEBHOOK_SUBSCRIPTION_ID={subscription.id}")
 
 @app.route('/exercises', methods=['GET'])
 def get_exercises():
-    exercises = Exercise.query.order_by(Exercise.muscle_group, Exercise.name).all()
-    return jsonify([{'id': e.id, 'name': e.name, 'muscle_group': e.muscle_group} for e in exercises])
+    payload, etag = exercise_catalog.json()
+    response = app.response_class(payload, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    # Answers 304 Not Modified when the client's If-None-Match still matches
+    return response.make_conditional(request)
+
+RECORDS_LIMIT = 10
+
+@app.route('/records/<int:exercise_id>', methods=['GET'])
+def exercise_records(exercise_id):
+    metric = request.args.get('metric', 'best_e1rm')
+    if metric not in RECORD_METRICS:
+        return jsonify({'error': f"metric must be one of {', '.join(RECORD_METRICS)}"}), 400
+    records = top_records(exercise_id, metric, RECORDS_LIMIT)
+    return jsonify([{
+        'username': record.username,
+        'best_weight': record.best_weight,
+        'best_e1rm': round(record.best_e1rm, 1),
+        'best_volume': record.best_volume
+    } for record in records])
 
 @app.context_processor
 def utility_processor():
-    def get_current_user():
-        if 'user_id' in session:
-            return User.query.get(session['user_id'])
-        return None
-    return dict(get_current_user=get_current_user)
+    return dict(get_current_user=get_current_user_summary, avatar_sources=avatar_sources,
+                default_avatar_url=DEFAULT_AVATAR_URL)
 
 @app.route('/strava/auth')
 def strava_auth():
@@ -317,7 +485,7 @@ def strava_auth():
         flash('Please login to connect with Strava', 'warning')
         return redirect(url_for('login'))
     
-    client = Client()
+    client = oauth_client()
     authorize_url = client.authorization_url(
         client_id=app.config['STRAVA_CLIENT_ID'],
         redirect_uri=app.config['STRAVA_REDIRECT_URI'],
@@ -332,7 +500,7 @@ def strava_callback():
         return redirect(url_for('login'))
     
     code = request.args.get('code')
-    client = Client()
+    client = oauth_client()
     token_response = client.exchange_code_for_token(
         client_id=app.config['STRAVA_CLIENT_ID'],
         client_secret=app.config['STRAVA_CLIENT_SECRET'],
@@ -342,24 +510,34 @@ def strava_callback():
     access_token = token_response['access_token']
     refresh_token = token_response['refresh_token']
     expires_at = datetime.fromtimestamp(token_response['expires_at'])
+    athlete_id = client.get_athlete().id
+    
+    other_account = StravaAccount.query.filter(StravaAccount.athlete_id == athlete_id,
+                                               StravaAccount.user_id != session['user_id']).first()
+    if other_account:
+        flash('This Strava account is already connected to another user.', 'danger')
+        return redirect(url_for('user_profile'))
     
     strava_account = StravaAccount.query.filter_by(user_id=session['user_id']).first()
     if strava_account:
         strava_account.access_token = access_token
         strava_account.refresh_token = refresh_token
         strava_account.token_expiry = expires_at
+        strava_account.athlete_id = athlete_id
     else:
         strava_account = StravaAccount(
             user_id=session['user_id'],
             access_token=access_token,
             refresh_token=refresh_token,
-            token_expiry=expires_at
+            token_expiry=expires_at,
+            athlete_id=athlete_id
         )
         db.session.add(strava_account)
     
     db.session.commit()
-    flash('Successfully connected to Strava!', 'success')
-    return redirect(url_for('import_strava_workouts'))
+    enqueue_strava_import(session['user_id'])
+    flash('Successfully connected to Strava! Importing your recent workouts in the background.', 'success')
+    return redirect(url_for('user_profile'))
 
 @app.route('/strava/import')
 def import_strava_workouts():
@@ -372,34 +550,61 @@ def import_strava_workouts():
         flash('Please connect your Strava account first', 'warning')
         return redirect(url_for('strava_auth'))
     
-    client = Client(access_token=strava_account.access_token)
+    enqueue_strava_import(session['user_id'])
+    flash('Strava import started. Your workouts will appear here shortly.', 'info')
+    return redirect(url_for('user_profile'))
+
+@app.route('/strava/backfill', methods=['POST'])
+def backfill_strava_workouts():
+    if 'user_id' not in session:
+        flash('Please login to import Strava workouts', 'warning')
+        return redirect(url_for('login'))
     
-    try:
-        activities = client.get_activities(after=datetime.utcnow() - timedelta(days=30))
-        for activity in activities:
-            existing_workout = StravaWorkout.query.filter_by(strava_id=str(activity.id)).first()
-            if not existing_workout:
-                new_workout = StravaWorkout(
-                    user_id=session['user_id'],
-                    strava_id=str(activity.id),
-                    name=activity.name,
-                    type=str(activity.type),
-                    start_date=activity.start_date,
-                    distance=float(activity.distance),
-                    moving_time=int(activity.moving_time),
-                    average_speed=float(activity.average_speed),
-                    total_elevation_gain=float(activity.total_elevation_gain)
-                )
-                db.session.add(new_workout)
-        
-        db.session.commit()
-        flash('Successfully imported Strava workouts!', 'success')
-    except AccessUnauthorized:
-        flash('Strava access token expired. Please reconnect your account.', 'warning')
+    strava_account = StravaAccount.query.filter_by(user_id=session['user_id']).first()
+    if not strava_account:
+        flash('Please connect your Strava account first', 'warning')
         return redirect(url_for('strava_auth'))
     
+    enqueue_strava_backfill(session['user_id'])
+    flash('Importing your full Strava history in the background. This can take a while.', 'info')
     return redirect(url_for('user_profile'))
 
+@app.route('/strava/webhook', methods=['GET'])
+def strava_webhook_verify():
+    # Subscription handshake: echo the challenge back if the verify token is ours
+    verify_token = app.config['STRAVA_WEBHOOK_VERIFY_TOKEN']
+    if (request.args.get('hub.mode') != 'subscribe' or not verify_token
+            or not hmac.compare_digest(request.args.get('hub.verify_token', ''), verify_token)):
+        abort(403)
+    return jsonify({'hub.challenge': request.args.get('hub.challenge')})
+
+@app.route('/strava/webhook', methods=['POST'])
+def strava_webhook():
+    event = request.get_json(silent=True)
+    if not isinstance(event, dict):
+        abort(400)
+    
+    # Events aren't signed, so without a subscription id to compare against, accept none
+    subscription_id = app.config['STRAVA_WEBHOOK_SUBSCRIPTION_ID']
+    if not subscription_id or str(event.get('subscription_id')) != subscription_id:
+        abort(403)
+    
+    # Strava retries events that aren't acknowledged within two seconds, so
+    # the worker does the fetching and checking
+    handle_webhook_event(event)
+    return '', 200
+
+@app.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    if 'user_id' not in session:
+        return jsonify({'error': 'Please log in'}), 401
+    
+    job = db.session.get(Job, job_id)
+    if not job or job.user_id != session['user_id']:
+        abort(404)
+    
+    return jsonify(job.to_dict())
+
 @app.route('/strava/disconnect', methods=['POST'])
 def strava_disconnect():
     if 'user_id' not in session:
@@ -413,9 +618,8 @@ def strava_disconnect():
     
     if strava_account:
         # Revoke Strava access token
-        client = Client()
         try:
-            client.deauthorize(access_token=strava_account.access_token)
+            get_strava_client(strava_account).deauthorize()
         except Exception as e:
             # Log the error, but continue with local cleanup
             print(f"Error revoking Strava token: {str(e)}")
@@ -448,29 +652,6 @@ def remove_strava_workout(workout_id):
     flash('Strava workout has been removed.', 'success')
     return redirect(url_for('user_profile'))
 
-def resize_and_crop(image, size):
-    """Resize and crop an image to fit the specified size."""
-    # If the image is larger than the specified size, resize it
-    if image.size[0] > size[0] or image.size[1] > size[1]:
-        image.thumbnail((size[0], size[1]), Image.LANCZOS)
-    
-    # Check which dimension is larger
-    if image.size[0] > image.size[1]:
-        # Width is larger. Calculate the trimming amount
-        left = (image.size[0] - size[0]) / 2
-        top = 0
-        right = (image.size[0] + size[0]) / 2
-        bottom = size[1]
-    else:
-        # Height is larger. Calculate the trimming amount
-        left = 0
-        top = (image.size[1] - size[1]) / 2
-        right = size[0]
-        bottom = (image.size[1] + size[1]) / 2
-    
-    # Crop and return the image
-    return image.crop((left, top, right, bottom))
-
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
 def allowed_file(filename):
@@ -491,67 +672,57 @@ def upload_profile_picture():
         return jsonify({'success': False, 'error': 'No selected file'})
     
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        
-        # Check file size (e.g., 5MB limit)
-        if len(file.read()) > 5 * 1024 * 1024:
+        # Check file size (5MB limit) without reading the upload into memory
+        if upload_size(file) > MAX_PROFILE_PICTURE_BYTES:
             return jsonify({'success': False, 'error': 'File size exceeds 5MB limit'})
-        file.seek(0)  # Reset file pointer after reading
+        if not is_image(file):
+            return jsonify({'success': False, 'error': 'Invalid file type'})
         
         try:
-            if current_app.env == 'production':
-                output = upload_file_to_s3(file, session['user_id'])
-                if output is None:
-                    raise Exception('Error uploading to S3')
-            else:
-                file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-                output = url_for('static', filename=f'profile_pictures/{filename}')
-            
-            user = User.query.get(session['user_id'])
-            if user.profile_picture != 'default.jpg':
-                if current_app.env == 'production':
-                    delete_file_from_s3(user.profile_picture)
-                else:
-                    os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], user.profile_picture))
+            # Resizing happens in the worker; the picture switches over once it's done
+            upload_key = stash_upload(file, session['user_id'])
+            job = enqueue_profile_picture(session['user_id'], upload_key)
             
-            user.profile_picture = output
-            db.session.commit()
-            
-            return jsonify({'success': True, 'message': 'Profile picture updated successfully', 'url': output})
+            return jsonify({'success': True, 'pending': True, 'message': 'Processing your profile picture',
+                            'job_url': url_for('job_status', job_id=job.id)})
         except Exception as e:
             logger.error(f"Error uploading profile picture: {str(e)}")
             return jsonify({'success': False, 'error': f'Error uploading profile picture: {str(e)}'})
     else:
         return jsonify({'success': False, 'error': 'Invalid file type'})
 
+@app.errorhandler(413)
+def request_entity_too_large(e):
+    if request.path == url_for('upload_profile_picture'):
+        return jsonify({'success': False, 'error': 'File size exceeds 5MB limit'}), 413
+    return e
+
 @app.route('/delete_profile_picture', methods=['POST'])
 def delete_profile_picture():
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'Please log in to manage your profile picture'})
     
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     if not user:
         return jsonify({'success': False, 'error': 'User not found'})
     
     if user.profile_picture != 'default.jpg':
-        if current_app.env == 'production':
-            delete_file_from_s3(user.profile_picture)
-        else:
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], user.profile_picture)
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        
         user.profile_picture = 'default.jpg'
         db.session.commit()
+        # The files go in the background sweep; another user may share them
+        enqueue_avatar_sweep()
         
         return jsonify({'success': True, 'message': 'Profile picture has been reset to default'})
     else:
         return jsonify({'success': False, 'error': 'You are already using the default profile picture'})
 
+ROSTER_PER_PAGE = 50
+
 @app.route('/roster', methods=['GET'])
 def roster():
-    users = User.query.all()
-    return render_template('roster.html', users=users)
+    page = max(request.args.get('page', 1, type=int), 1)
+    users, has_next = ranked_roster(page, ROSTER_PER_PAGE)
+    return render_template('roster.html', users=users, page=page, has_next=has_next)
 
 @app.route('/update_profile', methods=['POST'])
 def update_profile():
@@ -559,12 +730,13 @@ def update_profile():
         flash('Please log in to update your profile', 'warning')
         return redirect(url_for('login'))
 
-    user = User.query.get(session['user_id'])
+    user = get_current_user()
     if not user:
         flash('User not found', 'danger')
         return redirect(url_for('index'))
 
     # Update username
+    username_changed = False
     new_username = request.form.get('new_username')
     if new_username and new_username != user.username:
         if User.query.filter_by(username=new_username).first():
@@ -572,6 +744,7 @@ def update_profile():
         else:
             user.username = new_username
             flash('Username updated successfully', 'success')
+            username_changed = True
 
     # Update email
     new_email = request.form.get('new_email')
@@ -596,20 +769,19 @@ def update_profile():
             user.set_password(new_password)
             flash('Password updated successfully', 'success')
 
+    if username_changed:
+        bump_cache_version('leaderboard')
     db.session.commit()
     return redirect(url_for('user_profile'))
 
 @app.context_processor
 def inject_user():
-    if 'user_id' in session:
-        return {'user': db.session.get(User, session['user_id'])}
-    return {'user': None}
-
-with app.app_context():
-    db.create_all()
-    populate_exercises()
+    return {'user': get_current_user_summary()}
 
 if __name__ == '__main__':
+    # The dev server has no release phase, so bootstrap here instead
+    with app.app_context():
+        bootstrap_database()
     try:
         app.run(debug=True)
     except Exception as e:
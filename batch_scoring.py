@@ -0,0 +1,88 @@
+from datetime import datetime
+import numpy as np
+from sqlalchemy import insert, select
+from extensions import db
+from models import StrengthScore, Set, Workout
+
+# Rows fetched from the database at a time; each chunk is reduced before the next is read
+FETCH_SIZE = 100_000
+
+
+def estimated_one_rep_max(weights, reps):
+    """Epley estimate for arrays of weights and reps; a single rep is the weight itself."""
+    return np.where(reps <= 1, weights, weights * (1 + reps / 30.0))
+
+
+def _max_by_key(keys, values):
+    """Reduce (key, value) arrays to each distinct key and its largest value."""
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    best = np.full(len(unique_keys), -np.inf)
+    np.maximum.at(best, inverse, values)
+    return unique_keys, best
+
+
+def best_lifts(user_ids, exercise_ids, weights, reps):
+    """Each (user, exercise) pair's best estimated 1RM.
+
+    Pairs are packed into one int64 key (user id in the high 32 bits)
+    so the grouping is a single sort.
+    """
+    keys = (user_ids.astype(np.int64) << 32) | exercise_ids.astype(np.int64)
+    return _max_by_key(keys, estimated_one_rep_max(weights, reps))
+
+
+def relative_scores(keys, best):
+    """Each pair's best as a percent of the best anyone has on that exercise."""
+    exercise_ids = keys & 0xFFFFFFFF
+    exercises, inverse = np.unique(exercise_ids, return_inverse=True)
+    exercise_best = np.full(len(exercises), -np.inf)
+    np.maximum.at(exercise_best, inverse, best)
+    top = exercise_best[inverse]
+    # Bodyweight exercises logged at 0 lbs have nothing to compare against
+    return np.divide(100 * best, top, out=np.zeros_like(best), where=top > 0)
+
+
+def _set_columns(since=None):
+    query = select(Workout.user_id, Set.exercise_id, Set.weight, Set.reps).join(Set, Set.workout_id == Workout.id)
+    if since:
+        query = query.where(Workout.date >= since)
+    # Through the Core connection: these are plain columns, the ORM's row handling would only add overhead
+    result = db.session.connection().execute(query.execution_options(yield_per=FETCH_SIZE))
+    for chunk in result.partitions():
+        # Transpose in Python first: numpy probing each Row object for array-ness is far slower
+        user_ids, exercise_ids, weights, reps = zip(*chunk)
+        yield (np.array(user_ids, dtype=np.int64), np.array(exercise_ids, dtype=np.int64),
+               np.array(weights, dtype=np.float64), np.array(reps, dtype=np.float64))
+
+
+def compute_strength_scores(since=None):
+    """Rebuild the whole StrengthScore table from the sets logged since the given date (default: all).
+
+    `since` makes this a rolling-window rebuild, not an incremental update:
+    the table is emptied first, so any (user, exercise) pair with no sets
+    in the window loses its score.
+
+    Sets are read in columnar chunks and scored with array operations, so
+    no per-set Python code runs. Returns the number of rows written.
+    """
+    chunk_keys, chunk_best = [], []
+    for user_ids, exercise_ids, weights, reps in _set_columns(since):
+        keys, best = best_lifts(user_ids, exercise_ids, weights, reps)
+        chunk_keys.append(keys)
+        chunk_best.append(best)
+
+    StrengthScore.query.delete(synchronize_session=False)
+    row_count = 0
+    if chunk_keys:
+        # A pair can appear in several chunks; keep its overall best
+        keys, best = _max_by_key(np.concatenate(chunk_keys), np.concatenate(chunk_best))
+        relative = relative_scores(keys, best)
+        now = datetime.utcnow()
+        db.session.execute(insert(StrengthScore), [
+            {'user_id': key >> 32, 'exercise_id': key & 0xFFFFFFFF, 'best_e1rm': e1rm,
+             'relative_score': score, 'computed_at': now}
+            for key, e1rm, score in zip(keys.tolist(), best.tolist(), relative.tolist())
+        ])
+        row_count = len(keys)
+    db.session.commit()
+    return row_count
@@ -0,0 +1,97 @@
+"""Benchmark per-call S3 latency with a client per call vs the shared client.
+
+Each iteration does a put_object and a delete_object. "Client per call"
+builds a new boto3 client for both, as get_s3_client() used to;
+"shared client" goes through get_s3_client(). Without --endpoint-url a
+minimal local S3 stand-in is started in-process (any S3-compatible
+server, e.g. MinIO, can be passed instead).
+
+    python benchmarks/s3_client.py --calls 200
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import boto3
+from botocore.config import Config
+from flask import Flask
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from s3_utils import get_s3_client
+
+# s3_utils turns on DEBUG logging, and botocore's debug output would dominate the timings
+logging.getLogger().setLevel(logging.WARNING)
+
+BUCKET = 'benchmark'
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Accepts path-style PUT and DELETE object requests and stores nothing."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_PUT(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('ETag', '"d41d8cd98f00b204e9800998ecf8427e"')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_DELETE(self):
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stand_in():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def new_client(endpoint_url):
+    # What get_s3_client() used to do: a new client from boto3's default session
+    return boto3.client('s3', endpoint_url=endpoint_url, config=Config(s3={'addressing_style': 'path'}))
+
+
+def per_call_ms(calls, get_client):
+    body = b'x' * 1024
+    start = time.perf_counter()
+    for i in range(calls):
+        get_client().put_object(Bucket=BUCKET, Key=f'bench/{i}', Body=body)
+        get_client().delete_object(Bucket=BUCKET, Key=f'bench/{i}')
+    return (time.perf_counter() - start) * 1000 / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200, help='put+delete pairs per variant')
+    parser.add_argument('--endpoint-url', help='S3-compatible server to use instead of the built-in stand-in')
+    args = parser.parse_args()
+
+    # The stand-in doesn't check signatures, but botocore still needs something to sign with
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    endpoint_url = args.endpoint_url or start_stand_in()
+
+    app = Flask(__name__)
+    app.config.update(S3_BUCKET=BUCKET, S3_ENDPOINT_URL=endpoint_url)
+    with app.app_context():
+        # Warm up both paths (imports, endpoint data) before timing
+        per_call_ms(3, lambda: new_client(endpoint_url))
+        per_call_ms(3, get_s3_client)
+        print(f"Client per call: {per_call_ms(args.calls, lambda: new_client(endpoint_url)):.2f} ms per put+delete")
+        print(f"Shared client:   {per_call_ms(args.calls, get_s3_client):.2f} ms per put+delete")
+
+
+if __name__ == '__main__':
+    main()
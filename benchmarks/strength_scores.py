@@ -0,0 +1,128 @@
+"""Benchmark the strength score batch job (batch_scoring.py).
+
+Times the array scoring (best_lifts + relative_scores) on --sets synthetic
+sets, a plain Python loop doing the same work on --python-sets of them,
+and compute_strength_scores() end to end against a throwaway SQLite
+database holding --db-sets sets. The end-to-end time grows with the
+number of (user, exercise) pairs written as well as with the sets read;
+--users and --exercises set how many there can be.
+
+    python benchmarks/strength_scores.py --sets 10000000 --db-sets 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def synthetic_sets(count, users, exercises, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.integers(1, users + 1, count, dtype=np.int64),
+            rng.integers(1, exercises + 1, count, dtype=np.int64),
+            rng.integers(20, 400, count).astype(np.float64),
+            rng.integers(1, 15, count).astype(np.float64))
+
+
+def python_scores(user_ids, exercise_ids, weights, reps):
+    """The same scoring as batch_scoring, one set at a time."""
+    best = {}
+    for user_id, exercise_id, weight, rep_count in zip(user_ids, exercise_ids, weights, reps):
+        e1rm = weight if rep_count <= 1 else weight * (1 + rep_count / 30.0)
+        key = (user_id, exercise_id)
+        if e1rm > best.get(key, -1):
+            best[key] = e1rm
+    top = {}
+    for (_, exercise_id), e1rm in best.items():
+        top[exercise_id] = max(top.get(exercise_id, 0), e1rm)
+    return {key: 100 * e1rm / top[key[1]] if top[key[1]] else 0 for key, e1rm in best.items()}
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"{label}: {time.perf_counter() - start:.2f} s")
+    return result
+
+
+def bench_arrays(args):
+    from batch_scoring import best_lifts, relative_scores
+
+    columns = synthetic_sets(args.sets, args.users, args.exercises)
+
+    def score():
+        keys, best = best_lifts(*columns)
+        return relative_scores(keys, best)
+
+    timed(f"Array scoring, {args.sets:,} sets", score)
+    if args.python_sets:
+        sample = [column[:args.python_sets].tolist() for column in columns]
+        elapsed = time.perf_counter()
+        python_scores(*sample)
+        elapsed = time.perf_counter() - elapsed
+        print(f"Python loop, {args.python_sets:,} sets: {elapsed:.2f} s "
+              f"(~{elapsed * args.sets / args.python_sets:.1f} s for {args.sets:,})")
+
+
+def bench_end_to_end(args):
+    db_dir = tempfile.mkdtemp()
+    # app.py reads the database URL when it is imported
+    os.environ['DEVELOPMENT_DATABASE_URL'] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    from sqlalchemy import insert
+    from app import app
+    from batch_scoring import compute_strength_scores, _set_columns
+    from extensions import db
+    from models import Exercise, Set, User, Workout
+
+    sets_per_workout = 10
+    user_ids, exercise_ids, weights, reps = synthetic_sets(args.db_sets, args.users, args.exercises)
+    workout_count = -(-args.db_sets // sets_per_workout)
+    workout_users = user_ids[::sets_per_workout]
+    start_day = date(2020, 1, 1)
+
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(User), [{'id': i, 'username': f'user{i}'} for i in range(1, args.users + 1)])
+        db.session.execute(insert(Exercise), [
+            {'id': i, 'name': f'Exercise {i}', 'muscle_group': 'Legs'} for i in range(1, args.exercises + 1)
+        ])
+        db.session.execute(insert(Workout), [
+            {'id': i + 1, 'user_id': int(workout_users[i]), 'date': start_day + timedelta(days=i % 2000)}
+            for i in range(workout_count)
+        ])
+        db.session.execute(insert(Set), [
+            {'workout_id': i // sets_per_workout + 1, 'exercise_id': exercise_id, 'weight': weight,
+             'reps': rep_count, 'set_count': 1}
+            for i, (exercise_id, weight, rep_count) in enumerate(zip(
+                exercise_ids.tolist(), weights.tolist(), reps.astype(np.int64).tolist()))
+        ])
+        db.session.commit()
+
+        timed("Reading the sets alone", lambda: sum(len(columns[0]) for columns in _set_columns()))
+        row_count = timed(f"compute_strength_scores, {args.db_sets:,} sets on SQLite", compute_strength_scores)
+        print(f"{row_count:,} scores written")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sets', type=int, default=10_000_000, help='sets scored in memory')
+    parser.add_argument('--python-sets', type=int, default=1_000_000,
+                        help='sets for the Python loop baseline (0 to skip)')
+    parser.add_argument('--db-sets', type=int, default=1_000_000, help='sets for the end-to-end run (0 to skip)')
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--exercises', type=int, default=200)
+    args = parser.parse_args()
+
+    bench_arrays(args)
+    if args.db_sets:
+        bench_end_to_end(args)
+
+
+if __name__ == '__main__':
+    main()
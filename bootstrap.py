@@ -0,0 +1,54 @@
+import sqlalchemy as sa
+from flask_migrate import stamp, upgrade
+from sqlalchemy import insert
+from extensions import db, dialect_insert
+from models import Exercise
+from cache_versions import bump_cache_version
+
+SEED_EXERCISES = [
+    ('Bench Press', 'Chest'),
+    ('Squat', 'Legs'),
+    ('Deadlift', 'Back'),
+    ('Overhead Press', 'Shoulders'),
+    ('Bicep Curl', 'Arms'),
+    ('Tricep Extension', 'Arms'),
+    ('Lat Pulldown', 'Back'),
+    ('Leg Press', 'Legs'),
+    ('Dumbbell Fly', 'Chest'),
+    ('Calf Raise', 'Legs')
+]
+
+
+def seed_exercises():
+    """Insert any missing seed exercises with a single upsert statement."""
+    rows = [{'name': name, 'muscle_group': muscle_group} for name, muscle_group in SEED_EXERCISES]
+    upsert = dialect_insert(Exercise)
+
+    if upsert is not None:
+        db.session.execute(upsert.values(rows).on_conflict_do_nothing(index_elements=['name']))
+    else:
+        existing = {name for (name,) in db.session.query(Exercise.name)}
+        missing = [row for row in rows if row['name'] not in existing]
+        if missing:
+            db.session.execute(insert(Exercise), missing)
+
+    # Core inserts bypass the unit of work that normally bumps the catalog's version
+    bump_cache_version('exercises')
+    db.session.commit()
+
+
+def bootstrap_database():
+    """Set up a local development database and seed the exercise catalog.
+
+    Deploys don't use this: the Procfile release phase runs
+    `flask db upgrade` and then `flask seed-exercises`. The migrations
+    start from a schema that predates them, so a fresh database is built
+    from the models and stamped at the latest revision instead; an
+    existing one is migrated.
+    """
+    if not sa.inspect(db.engine).get_table_names():
+        db.create_all()
+        stamp()
+    else:
+        upgrade()
+    seed_exercises()
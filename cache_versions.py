@@ -0,0 +1,124 @@
+import threading
+from flask import g, has_request_context
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.orm import Session
+from extensions import db, dialect_insert
+from models import CacheVersion
+
+# Version name -> caches (in this process) to drop when a bump of it commits
+_caches = {}
+# (models, version name): flushes that write one of the models bump the version
+_tracked = []
+
+_PENDING = 'cache_versions_pending'
+
+
+class VersionedCache:
+    """Base class for the in-process caches.
+
+    Every web worker has its own copy, so a write announces itself to the
+    other processes by bumping the cache's row in cache_version as part of
+    its transaction. A reader compares that version (read once per request)
+    with the one the copy was loaded under, and starts over when it has
+    moved on. Within a process the generation counter covers the same race:
+    a load that overlaps an invalidation isn't cached.
+    """
+
+    version_name = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._version = None
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def _sync(self, version):
+        """Start over if the shared version has moved since the cache was filled; call with the lock held."""
+        if version != self._version:
+            self._version = version
+            self._generation += 1
+            self._clear()
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._clear()
+
+
+def register_cache(cache, models=()):
+    """Drop `cache` when a bump of its version commits in this process.
+
+    Flushes that insert, update or delete any of `models` bump the version
+    automatically; writes that bypass the unit of work (bulk and Core
+    statements) call bump_cache_version() themselves.
+    """
+    _caches.setdefault(cache.version_name, []).append(cache)
+    if models:
+        _tracked.append((tuple(models), cache.version_name))
+
+
+def _load_versions():
+    return dict(db.session.execute(select(CacheVersion.name, CacheVersion.version)).all())
+
+
+def current_cache_version(name):
+    """The shared version of a cache, read with one query per request for all of them."""
+    if not has_request_context():
+        return _load_versions().get(name, 0)
+    if 'cache_versions' not in g:
+        g.cache_versions = _load_versions()
+    return g.cache_versions.get(name, 0)
+
+
+def _bump(session, name):
+    pending = session.info.setdefault(_PENDING, set())
+    # Other processes only see the bump once it commits, so once per transaction is enough
+    if name in pending:
+        return
+    pending.add(name)
+
+    table = CacheVersion.__table__
+    upsert = dialect_insert(CacheVersion)
+    if upsert is not None:
+        session.connection().execute(upsert.values(name=name, version=1).on_conflict_do_update(
+            index_elements=['name'], set_={'version': table.c.version + 1}
+        ))
+        return
+    result = session.connection().execute(
+        update(table).where(table.c.name == name).values(version=table.c.version + 1))
+    if result.rowcount == 0:
+        session.connection().execute(insert(table).values(name=name, version=1))
+
+
+def bump_cache_version(name):
+    """Mark a cache stale in every process, as part of the current transaction."""
+    _bump(db.session(), name)
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_for_flushed_writes(session, flush_context):
+    # new/dirty/deleted still describe what this flush wrote
+    written = list(session.new) + list(session.deleted) + [
+        obj for obj in session.dirty if session.is_modified(obj, include_collections=False)
+    ]
+    for models, name in _tracked:
+        if any(isinstance(obj, models) for obj in written):
+            _bump(session, name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    # Only now can no reader in this process load the data from before the write
+    pending = session.info.pop(_PENDING, ())
+    for name in pending:
+        for cache in _caches.get(name, ()):
+            cache.invalidate()
+    if pending and has_request_context():
+        g.pop('cache_versions', None)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop(_PENDING, None)
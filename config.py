@@ -7,6 +7,9 @@ class Config:
     AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
     AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')  # Default to us-east-1 if not set
     S3_LOCATION = f"https://{S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/" if S3_BUCKET else None
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')  # e.g. a local MinIO; None means AWS
+    S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', 10))
+    S3_MAX_ATTEMPTS = int(os.environ.get('S3_MAX_ATTEMPTS', 3))
     DEBUG = False
     TESTING = False
 
@@ -0,0 +1,36 @@
+from collections import namedtuple
+from flask import g, session
+from extensions import db
+from models import User
+
+# The columns the navbar and the admin checks need
+CurrentUserSummary = namedtuple('CurrentUserSummary', ['id', 'username', 'is_admin', 'profile_picture'])
+
+
+def get_current_user():
+    """Return the logged-in User, loading it at most once per request."""
+    if 'user_id' not in session:
+        return None
+    if '_current_user' not in g:
+        g._current_user = db.session.get(User, session['user_id'])
+    return g._current_user
+
+
+def get_current_user_summary():
+    """Return the navbar columns of the logged-in user without loading the full row.
+
+    If the view already loaded the full User, it is reused instead of
+    querying again.
+    """
+    if 'user_id' not in session:
+        return None
+    if '_current_user_summary' not in g:
+        user = g.get('_current_user')
+        if user is not None:
+            g._current_user_summary = CurrentUserSummary(user.id, user.username, user.is_admin, user.profile_picture)
+        else:
+            row = db.session.query(
+                User.id, User.username, User.is_admin, User.profile_picture
+            ).filter(User.id == session['user_id']).first()
+            g._current_user_summary = CurrentUserSummary(*row) if row else None
+    return g._current_user_summary
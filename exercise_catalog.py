@@ -0,0 +1,77 @@
+import hashlib
+import json
+from collections import namedtuple
+from extensions import db
+from models import Exercise
+from cache_versions import VersionedCache, register_cache, current_cache_version
+
+CatalogExercise = namedtuple('CatalogExercise', ['id', 'name', 'muscle_group'])
+
+
+class ExerciseCatalog(VersionedCache):
+    """Per-process copy of the exercise table.
+
+    The catalog is loaded on first use. Inserting, updating or deleting an
+    Exercise through the ORM bumps the 'exercises' version, and every
+    process drops its copy once that write has committed. Writes that
+    bypass the ORM must call bump_cache_version('exercises') themselves.
+    """
+
+    version_name = 'exercises'
+
+    def __init__(self):
+        super().__init__()
+        self._snapshot = None
+
+    def _clear(self):
+        self._snapshot = None
+
+    def _load(self):
+        exercises = [
+            CatalogExercise(e.id, e.name, e.muscle_group)
+            for e in db.session.query(Exercise.id, Exercise.name, Exercise.muscle_group).order_by(Exercise.id)
+        ]
+        by_muscle_group = sorted(exercises, key=lambda e: (e.muscle_group, e.name))
+        payload = json.dumps([e._asdict() for e in by_muscle_group])
+        return {
+            'exercises': exercises,
+            'by_id': {e.id: e for e in exercises},
+            'muscle_groups': sorted({e.muscle_group for e in exercises}),
+            'json': payload,
+            'etag': hashlib.sha1(payload.encode('utf-8')).hexdigest(),
+        }
+
+    def _get(self):
+        version = current_cache_version(self.version_name)
+        with self._lock:
+            self._sync(version)
+            if self._snapshot is not None:
+                return self._snapshot
+            generation = self._generation
+
+        snapshot = self._load()
+
+        with self._lock:
+            # Don't keep a catalog that a concurrent write has already made stale
+            if generation == self._generation:
+                self._snapshot = snapshot
+        return snapshot
+
+    def exercises(self):
+        """All exercises in id order, for the workout and template forms."""
+        return self._get()['exercises']
+
+    def get(self, exercise_id):
+        return self._get()['by_id'].get(exercise_id)
+
+    def muscle_groups(self):
+        return self._get()['muscle_groups']
+
+    def json(self):
+        """The /exercises payload (ordered by muscle group, then name) and its ETag."""
+        snapshot = self._get()
+        return snapshot['json'], snapshot['etag']
+
+
+exercise_catalog = ExerciseCatalog()
+register_cache(exercise_catalog, models=(Exercise,))
@@ -33,3 +33,18 @@ def init_db(app):
 
     db.init_app(app)
     migrate.init_app(app, db)
+
+def dialect_insert(model):
+    """Return an INSERT for the model with on_conflict_* support, or None.
+
+    Postgres and SQLite both support ON CONFLICT; callers fall back to a
+    plain insert on other databases.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(model)
@@ -0,0 +1,198 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from flask import current_app
+from extensions import db
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS = {}
+
+# A running job whose worker hasn't finished it in this long is assumed dead
+STALE_LOCK_TIMEOUT = timedelta(minutes=15)
+
+# Claimed jobs keep their dedupe_key under this prefix until they finish
+RUNNING_KEY_PREFIX = 'running:'
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying the job cannot help."""
+
+
+class RetryJobLater(Exception):
+    """Raised by a handler to put its job back in the queue until run_at.
+
+    Unlike a failure this doesn't use up an attempt. Anything the handler
+    wants to keep must be committed before raising.
+    """
+
+    def __init__(self, run_at, reason='Deferred'):
+        super().__init__(reason)
+        self.run_at = run_at
+
+
+def job_handler(kind):
+    def decorator(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def _running_key(dedupe_key):
+    return RUNNING_KEY_PREFIX + dedupe_key
+
+
+def enqueue(kind, payload, user_id=None, dedupe_key=None, max_attempts=5):
+    """Queue a job and return it.
+
+    If a job with the same dedupe_key is still waiting to run, that job is
+    returned instead of queueing a second one. A job that has already
+    started doesn't count, since it may have read its data before whatever
+    prompted this call: one follow-up job is queued, and it only runs once
+    the first has finished.
+    """
+    if dedupe_key:
+        existing = Job.query.filter(
+            Job.dedupe_key.in_([dedupe_key, _running_key(dedupe_key)]),
+            Job.status == 'queued'
+        ).first()
+        if existing:
+            return existing
+
+    now = datetime.utcnow()
+    job = Job(kind=kind, payload=payload, user_id=user_id, dedupe_key=dedupe_key,
+              max_attempts=max_attempts, status='queued', attempts=0, run_at=now, created_at=now)
+    db.session.add(job)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request queued the same work between our check and insert
+        db.session.rollback()
+        return Job.query.filter_by(dedupe_key=dedupe_key).first()
+    return job
+
+
+def claim_next_job():
+    """Atomically move the next due job to 'running' and return it, or None.
+
+    Claiming a job moves its dedupe_key to 'running:<key>', so the same work
+    can be queued once more behind it. The job keeps that key if it is put
+    back in the queue for a retry, and a queued job whose work is still
+    running (or waiting for a retry) isn't claimed.
+    """
+    now = datetime.utcnow()
+    started = aliased(Job)
+    # Plain tuples, not Job objects: a commit below would expire those and
+    # reload them with another worker's claim already applied
+    candidates = db.session.query(Job.id, Job.status, Job.attempts, Job.dedupe_key).filter(
+        db.or_(
+            db.and_(Job.status == 'queued', Job.run_at <= now, ~db.exists().where(
+                started.dedupe_key == RUNNING_KEY_PREFIX + Job.dedupe_key
+            )),
+            db.and_(Job.status == 'running', Job.locked_at < now - STALE_LOCK_TIMEOUT)
+        )
+    ).order_by(Job.run_at).limit(10).all()
+
+    for job_id, status, attempts, dedupe_key in candidates:
+        claim = {'status': 'running', 'locked_at': now, 'attempts': attempts + 1}
+        if dedupe_key and not dedupe_key.startswith(RUNNING_KEY_PREFIX):
+            claim['dedupe_key'] = _running_key(dedupe_key)
+        # Only one worker wins the conditional update for a given job
+        try:
+            claimed = Job.query.filter(
+                Job.id == job_id,
+                Job.status == status,
+                Job.attempts == attempts
+            ).update(claim, synchronize_session=False)
+            db.session.commit()
+        except IntegrityError:
+            # Another worker started the same work since we looked
+            db.session.rollback()
+            continue
+        if claimed:
+            return db.session.get(Job, job_id)
+    return None
+
+
+def run_job(job):
+    handler = JOB_HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise PermanentJobError(f"No handler for job kind '{job.kind}'")
+        handler(**job.payload)
+    except RetryJobLater as e:
+        db.session.rollback()
+        job = db.session.get(Job, job.id)
+        logger.info(f"Job {job.id} ({job.kind}) deferred until {e.run_at}: {str(e)}")
+        job.status = 'queued'
+        job.locked_at = None
+        job.run_at = e.run_at
+        job.attempts -= 1
+        db.session.commit()
+        return
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(Job, job.id)
+        job.last_error = str(e)
+        if isinstance(e, PermanentJobError) or job.attempts >= job.max_attempts:
+            logger.error(f"Job {job.id} ({job.kind}) failed: {str(e)}")
+            _finish(job, 'failed')
+        else:
+            # Exponential backoff: 30s, 60s, 120s, ...
+            delay = timedelta(seconds=30 * 2 ** (job.attempts - 1))
+            logger.warning(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed, retrying in {delay}: {str(e)}")
+            job.status = 'queued'
+            job.locked_at = None
+            job.run_at = datetime.utcnow() + delay
+        db.session.commit()
+        return
+
+    job = db.session.get(Job, job.id)
+    job.last_error = None
+    _finish(job, 'succeeded')
+    db.session.commit()
+
+
+def _finish(job, status):
+    job.status = status
+    job.locked_at = None
+    job.dedupe_key = None
+    job.finished_at = datetime.utcnow()
+
+
+def work(poll_interval=2.0, once=False):
+    """Run jobs until stopped; with once=True, drain the due jobs and return."""
+    while True:
+        job = claim_next_job()
+        if job is None:
+            if once:
+                return
+            db.session.remove()
+            time.sleep(poll_interval)
+            continue
+        logger.info(f"Running job {job.id} ({job.kind}), attempt {job.attempts}")
+        run_job(job)
+        db.session.remove()
+
+
+def work_in_threads(threads, poll_interval=2.0, once=False):
+    """Run `threads` copies of work() in this process and wait for them.
+
+    Claiming is atomic, so the threads never pick up the same job. Each
+    thread gets its own app context, and so its own session.
+    """
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            work(poll_interval=poll_interval, once=once)
+
+    workers = [threading.Thread(target=run, name=f'job-worker-{i}', daemon=True) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
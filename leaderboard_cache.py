@@ -0,0 +1,70 @@
+from datetime import timedelta
+from cache_versions import VersionedCache, register_cache, current_cache_version
+
+
+def period_start(time_period, today):
+    """Return the first day of the leaderboard window containing today."""
+    if time_period == 'week':
+        return today - timedelta(days=today.weekday())
+    if time_period == 'month':
+        return today.replace(day=1)
+    if time_period == 'year':
+        return today.replace(month=1, day=1)
+    return None
+
+
+class LeaderboardCache(VersionedCache):
+    """Per-process cache of leaderboard results.
+
+    Entries are keyed by (muscle_group, time_period, period start), so a new
+    week/month/year gets a fresh key as soon as the window rolls over. The
+    rollup refreshes and username changes bump the 'leaderboard' version in
+    their transaction, which every process checks before using its entries.
+    """
+
+    version_name = 'leaderboard'
+
+    def __init__(self):
+        super().__init__()
+        self._results = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _clear(self):
+        self._results.clear()
+
+    def get_results(self, muscle_group, time_period, start_date, loader):
+        key = (muscle_group, time_period, start_date)
+        version = current_cache_version(self.version_name)
+        with self._lock:
+            self._sync(version)
+            if key in self._results:
+                self.hits += 1
+                return self._results[key]
+            self.misses += 1
+            generation = self._generation
+
+        results = loader()
+
+        with self._lock:
+            # A write landed while we were loading; don't cache stale data
+            if generation != self._generation:
+                return results
+            # Drop entries for windows that have rolled over
+            for stale_key in [k for k in self._results if k[:2] == key[:2]]:
+                del self._results[stale_key]
+            self._results[key] = results
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._results),
+                'version': self._version,
+            }
+
+
+leaderboard_cache = LeaderboardCache()
+register_cache(leaderboard_cache)
@@ -0,0 +1,38 @@
+"""add indexes for hot queries
+
+Revision ID: 5c00b0e62969
+Revises: 370b777d8b58
+Create Date: 2026-10-18 10:03:17.554920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c00b0e62969'
+down_revision = '370b777d8b58'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_workout_user_id_date', 'workout', ['user_id', 'date']),
+    ('ix_set_workout_id_exercise_id', 'set', ['workout_id', 'exercise_id']),
+    ('ix_set_exercise_id', 'set', ['exercise_id']),
+    ('ix_strava_workout_user_id_start_date', 'strava_workout', ['user_id', 'start_date']),
+    ('ix_weekly_workout_week_start_date', 'weekly_workout', ['week_start_date']),
+    ('ix_workout_template_exercise_template_id', 'workout_template_exercise', ['template_id']),
+    ('ix_daily_volume_date', 'daily_volume', ['date']),
+    ('ix_daily_volume_muscle_group_date', 'daily_volume', ['muscle_group', 'date']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,52 @@
+"""group identical sets into one row with a set count
+
+Revision ID: f0a278e86f41
+Revises: 5c00b0e62969
+Create Date: 2026-10-18 11:26:50.031744
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f0a278e86f41'
+down_revision = '5c00b0e62969'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('set', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('set_count', sa.Integer(), nullable=False, server_default='1'))
+
+    # Collapse identical rows of the same workout into the lowest id
+    op.execute(
+        'UPDATE "set" SET set_count = ('
+        'SELECT SUM(dup.set_count) FROM "set" AS dup '
+        'WHERE dup.workout_id = "set".workout_id AND dup.exercise_id = "set".exercise_id '
+        'AND dup.weight = "set".weight AND dup.reps = "set".reps) '
+        'WHERE id IN (SELECT MIN(id) FROM "set" GROUP BY workout_id, exercise_id, weight, reps)'
+    )
+    op.execute(
+        'DELETE FROM "set" '
+        'WHERE id NOT IN (SELECT MIN(id) FROM "set" GROUP BY workout_id, exercise_id, weight, reps)'
+    )
+
+
+def downgrade():
+    # Expand every grouped row back into one row per set
+    conn = op.get_bind()
+    grouped = conn.execute(sa.text(
+        'SELECT workout_id, exercise_id, weight, reps, set_count FROM "set" WHERE set_count > 1'
+    )).all()
+    for workout_id, exercise_id, weight, reps, set_count in grouped:
+        for _ in range(set_count - 1):
+            conn.execute(
+                sa.text('INSERT INTO "set" (workout_id, exercise_id, weight, reps, set_count) '
+                        'VALUES (:workout_id, :exercise_id, :weight, :reps, 1)'),
+                {'workout_id': workout_id, 'exercise_id': exercise_id, 'weight': weight, 'reps': reps}
+            )
+
+    with op.batch_alter_table('set', schema=None) as batch_op:
+        batch_op.drop_column('set_count')
@@ -1,4 +1,6 @@
 from extensions import db
+from sqlalchemy import case
+from sqlalchemy.ext.hybrid import hybrid_property
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class User(db.Model):
@@ -27,32 +29,73 @@ class Workout(db.Model):
     date = db.Column(db.Date, nullable=False)
     sets = db.relationship('Set', backref='workout', lazy=True, cascade='all, delete-orphan')
 
+    __table_args__ = (db.Index('ix_workout_user_id_date', 'user_id', 'date'),)
+
 class Set(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     workout_id = db.Column(db.Integer, db.ForeignKey('workout.id'), nullable=False)
     exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), nullable=False)
     weight = db.Column(db.Float, nullable=False)
     reps = db.Column(db.Integer, nullable=False)
+    set_count = db.Column(db.Integer, nullable=False, default=1)
     exercise = db.relationship('Exercise')
 
+    @hybrid_property
+    def volume(self):
+        return self.weight * self.reps * self.set_count
+
+    @hybrid_property
+    def estimated_1rm(self):
+        # Epley formula; a single rep is just the weight
+        if self.reps <= 1:
+            return self.weight
+        return self.weight * (1 + self.reps / 30.0)
+
+    @estimated_1rm.expression
+    def estimated_1rm(cls):
+        return case((cls.reps <= 1, cls.weight), else_=cls.weight * (1 + cls.reps / 30.0))
+
+    __table_args__ = (
+        db.Index('ix_set_workout_id_exercise_id', 'workout_id', 'exercise_id'),
+        db.Index('ix_set_exercise_id', 'exercise_id'),
+    )
+
 class WeeklyWorkout(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    week_start_date = db.Column(db.Date, nullable=False)
-    monday_template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id'))
-    tuesday_template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id'))
-    wednesday_template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id'))
-    thursday_template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id'))
-    friday_template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id'))
-    saturday_template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id'))
-    sunday_template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id'))
-
-    monday_template = db.relationship('WorkoutTemplate', foreign_keys=[monday_template_id])
-    tuesday_template = db.relationship('WorkoutTemplate', foreign_keys=[tuesday_template_id])
-    wednesday_template = db.relationship('WorkoutTemplate', foreign_keys=[wednesday_template_id])
-    thursday_template = db.relationship('WorkoutTemplate', foreign_keys=[thursday_template_id])
-    friday_template = db.relationship('WorkoutTemplate', foreign_keys=[friday_template_id])
-    saturday_template = db.relationship('WorkoutTemplate', foreign_keys=[saturday_template_id])
-    sunday_template = db.relationship('WorkoutTemplate', foreign_keys=[sunday_template_id])
+    week_start_date = db.Column(db.Date, nullable=False, index=True)
+
+    days = db.relationship('WeeklyWorkoutDay', backref='weekly_workout', lazy=True,
+                           cascade='all, delete-orphan', order_by='WeeklyWorkoutDay.weekday')
+
+    @property
+    def schedule(self):
+        """{weekday: WeeklyWorkoutDay} for the days that have a template; the rest are rest days."""
+        return {day.weekday: day for day in self.days}
+
+    def set_schedule(self, template_ids):
+        """Make the week match {weekday: template_id}, updating rows in place where the day already exists."""
+        existing = self.schedule
+        for weekday, day in existing.items():
+            if weekday not in template_ids:
+                self.days.remove(day)
+        for weekday, template_id in template_ids.items():
+            if weekday in existing:
+                existing[weekday].template_id = template_id
+            else:
+                self.days.append(WeeklyWorkoutDay(weekday=weekday, template_id=template_id))
+
+class WeeklyWorkoutDay(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    weekly_workout_id = db.Column(db.Integer, db.ForeignKey('weekly_workout.id'), nullable=False)
+    # date.weekday() numbering: Monday is 0, Sunday is 6
+    weekday = db.Column(db.SmallInteger, nullable=False)
+    template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id'), nullable=False)
+
+    template = db.relationship('WorkoutTemplate')
+
+    __table_args__ = (
+        db.UniqueConstraint('weekly_workout_id', 'weekday'),
+    )
 
 class WorkoutExercise(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -69,6 +112,13 @@ class StravaAccount(db.Model):
     access_token = db.Column(db.String(255), nullable=False)
     refresh_token = db.Column(db.String(255), nullable=False)
     token_expiry = db.Column(db.DateTime, nullable=False)
+    # Strava's id for the athlete; webhook events identify the account by it
+    athlete_id = db.Column(db.BigInteger, index=True, unique=True, nullable=True)
+    # Sync cursor: start time of the newest activity imported so far
+    last_activity_at = db.Column(db.DateTime, nullable=True)
+    # Backfill cursor: the backfill has imported everything after this point
+    backfill_before = db.Column(db.DateTime, nullable=True)
+    backfill_complete = db.Column(db.Boolean, nullable=False, default=False)
 
     user = db.relationship('User', backref=db.backref('strava_account', uselist=False))
 
@@ -86,6 +136,8 @@ class StravaWorkout(db.Model):
 
     user = db.relationship('User', backref=db.backref('strava_workouts', lazy='dynamic'))
 
+    __table_args__ = (db.Index('ix_strava_workout_user_id_start_date', 'user_id', 'start_date'),)
+
 class WorkoutTemplate(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -93,23 +145,135 @@ class WorkoutTemplate(db.Model):
     exercises = db.relationship('WorkoutTemplateExercise', backref='template', lazy=True, cascade="all, delete-orphan")
 
     def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'created_by_name': db.session.get(User, self.created_by).username,
-            'created_by_id': self.created_by,
-            'exercises': [{
-                'name': db.session.get(Exercise, exercise.exercise_id).name,
-                'sets': exercise.sets,
-                'reps': exercise.reps
-            } for exercise in self.exercises]
-        }
+        return WorkoutTemplate.to_dicts([self])[0]
+
+    @staticmethod
+    def to_dicts(templates):
+        """Serialize many templates with one query for creators and one for exercises."""
+        template_ids = [template.id for template in templates]
+        creator_ids = {template.created_by for template in templates}
+
+        creator_names = dict(
+            db.session.query(User.id, User.username).filter(User.id.in_(creator_ids))
+        ) if creator_ids else {}
+
+        exercises_by_template = {template_id: [] for template_id in template_ids}
+        if template_ids:
+            rows = db.session.query(
+                WorkoutTemplateExercise.template_id,
+                Exercise.name,
+                WorkoutTemplateExercise.sets,
+                WorkoutTemplateExercise.reps
+            ).join(Exercise, Exercise.id == WorkoutTemplateExercise.exercise_id).filter(
+                WorkoutTemplateExercise.template_id.in_(template_ids)
+            ).order_by(WorkoutTemplateExercise.id)
+            for template_id, name, sets, reps in rows:
+                exercises_by_template[template_id].append({'name': name, 'sets': sets, 'reps': reps})
+
+        return [{
+            'id': template.id,
+            'name': template.name,
+            'created_by_name': creator_names.get(template.created_by),
+            'created_by_id': template.created_by,
+            'exercises': exercises_by_template[template.id]
+        } for template in templates]
 
 class WorkoutTemplateExercise(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id'), nullable=False)
+    template_id = db.Column(db.Integer, db.ForeignKey('workout_template.id'), nullable=False, index=True)
     exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), nullable=False)
     sets = db.Column(db.Integer, nullable=False)
     reps = db.Column(db.Integer, nullable=False)
 
     exercise = db.relationship('Exercise')
+
+class DailyVolume(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    muscle_group = db.Column(db.String(50), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    total_volume = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'muscle_group', 'date'),
+        db.Index('ix_daily_volume_date', 'date'),
+        db.Index('ix_daily_volume_muscle_group_date', 'muscle_group', 'date'),
+    )
+
+class PersonalRecord(db.Model):
+    """Each user's bests per exercise, kept current by the workout write routes."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), nullable=False)
+    best_weight = db.Column(db.Float, nullable=False)
+    best_e1rm = db.Column(db.Float, nullable=False)
+    # Most volume (weight * reps * sets) for the exercise in a single workout
+    best_volume = db.Column(db.Float, nullable=False)
+
+    user = db.relationship('User')
+    exercise = db.relationship('Exercise')
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'exercise_id'),
+        # Top-N boards per exercise read these in order
+        db.Index('ix_personal_record_exercise_id_best_weight', 'exercise_id', 'best_weight'),
+        db.Index('ix_personal_record_exercise_id_best_e1rm', 'exercise_id', 'best_e1rm'),
+        db.Index('ix_personal_record_exercise_id_best_volume', 'exercise_id', 'best_volume'),
+    )
+
+class StrengthScore(db.Model):
+    """Best estimated 1RM per user and exercise, and how it compares to the exercise's best.
+
+    Recomputed in bulk by 'flask compute-strength-scores' (see batch_scoring.py).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    exercise_id = db.Column(db.Integer, db.ForeignKey('exercise.id'), nullable=False)
+    best_e1rm = db.Column(db.Float, nullable=False)
+    # Percent of the best e1RM anyone has on this exercise (100 = strongest)
+    relative_score = db.Column(db.Float, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'exercise_id'),
+        db.Index('ix_strength_score_exercise_id_relative_score', 'exercise_id', 'relative_score'),
+    )
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    # Set until the job finishes so the same work can't be queued twice; a claimed job's key
+    # becomes 'running:<key>', which lets one follow-up be queued behind it (see jobs.claim_next_job)
+    dedupe_key = db.Column(db.String(255), unique=True, nullable=True)
+    run_at = db.Column(db.DateTime, nullable=False)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (db.Index('ix_job_status_run_at', 'status', 'run_at'),)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class CacheVersion(db.Model):
+    """A counter per in-process cache, bumped by every write that makes the cache stale.
+
+    Each web worker keeps its own copy of the cached data; comparing this
+    row with the version its copy was loaded under is how a worker learns
+    about writes made by other processes (see cache_versions.py).
+    """
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
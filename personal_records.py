@@ -0,0 +1,96 @@
+from sqlalchemy import func, insert
+from extensions import db, dialect_insert
+from models import PersonalRecord, Workout, Set, User
+
+RECORD_METRICS = ('best_weight', 'best_e1rm', 'best_volume')
+
+
+def _records_query(*criteria):
+    """Aggregate (user_id, exercise_id, best_weight, best_e1rm, best_volume) over the matching sets."""
+    # Per workout first, so best_volume is the best single session rather than the lifetime total
+    per_workout = db.session.query(
+        Workout.user_id,
+        Set.exercise_id,
+        func.max(Set.weight).label('best_weight'),
+        func.max(Set.estimated_1rm).label('best_e1rm'),
+        func.sum(Set.volume).label('volume')
+    ).select_from(Workout).join(Workout.sets).filter(*criteria).group_by(
+        Workout.user_id, Set.exercise_id, Workout.id
+    ).subquery()
+
+    return db.session.query(
+        per_workout.c.user_id,
+        per_workout.c.exercise_id,
+        func.max(per_workout.c.best_weight).label('best_weight'),
+        func.max(per_workout.c.best_e1rm).label('best_e1rm'),
+        func.max(per_workout.c.volume).label('best_volume')
+    ).group_by(per_workout.c.user_id, per_workout.c.exercise_id)
+
+
+def refresh_personal_records(user_id, exercise_ids):
+    """Recompute one user's records for the given exercises.
+
+    Recomputing from the user's remaining sets (rather than comparing the
+    new sets against the old record) keeps records right when the set
+    holding one is edited or deleted. Like refresh_daily_volume, this runs
+    inside the caller's transaction (call it after the changes are added
+    and before the commit), upserts the current records and deletes only
+    those for exercises the user no longer has sets of.
+    """
+    exercise_ids = {exercise_id for exercise_id in exercise_ids if exercise_id is not None}
+    if not exercise_ids:
+        return
+
+    db.session.flush()
+
+    rows = [row._asdict() for row in _records_query(
+        Workout.user_id == user_id,
+        Set.exercise_id.in_(exercise_ids)
+    )]
+
+    stale = PersonalRecord.query.filter(
+        PersonalRecord.user_id == user_id,
+        PersonalRecord.exercise_id.in_(exercise_ids)
+    )
+    upsert = dialect_insert(PersonalRecord)
+    if upsert is None:
+        stale.delete(synchronize_session=False)
+        if rows:
+            db.session.execute(insert(PersonalRecord), rows)
+        return
+
+    stale.filter(
+        PersonalRecord.exercise_id.notin_([row['exercise_id'] for row in rows])
+    ).delete(synchronize_session=False)
+    if rows:
+        upsert = upsert.values(rows)
+        db.session.execute(upsert.on_conflict_do_update(
+            index_elements=['user_id', 'exercise_id'],
+            set_={metric: upsert.excluded[metric] for metric in RECORD_METRICS}
+        ))
+
+
+def rebuild_personal_records():
+    """Recreate the whole records table from the raw Set rows."""
+    PersonalRecord.query.delete(synchronize_session=False)
+    db.session.execute(
+        insert(PersonalRecord).from_select(
+            ['user_id', 'exercise_id', 'best_weight', 'best_e1rm', 'best_volume'],
+            _records_query().statement
+        )
+    )
+    db.session.commit()
+    return PersonalRecord.query.count()
+
+
+def top_records(exercise_id, metric='best_e1rm', limit=10):
+    """The top records for an exercise by one metric, read in index order."""
+    column = getattr(PersonalRecord, metric)
+    return db.session.query(
+        User.username,
+        PersonalRecord.best_weight,
+        PersonalRecord.best_e1rm,
+        PersonalRecord.best_volume
+    ).select_from(PersonalRecord).join(User, User.id == PersonalRecord.user_id).filter(
+        PersonalRecord.exercise_id == exercise_id
+    ).order_by(column.desc()).limit(limit).all()
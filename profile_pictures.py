@@ -0,0 +1,271 @@
+import hashlib
+import io
+import os
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from PIL import Image, ImageOps, UnidentifiedImageError
+from extensions import db
+from models import User
+from jobs import job_handler, enqueue, PermanentJobError
+from s3_utils import (upload_fileobj_to_s3, download_fileobj_from_s3, delete_file_from_s3, s3_url, list_s3_objects,
+                      touch_s3_object)
+
+MAX_PROFILE_PICTURE_BYTES = 5 * 1024 * 1024
+# Square avatar widths: navbar/roster/leaderboard rows use the small ones, the profile page the large ones
+AVATAR_SIZES = (48, 128, 256, 512)
+# (format, extension, save options); WebP for browsers that take it, JPEG as the fallback
+AVATAR_FORMATS = [('WEBP', 'webp', {'quality': 80, 'method': 6}), ('JPEG', 'jpg', {'quality': 85, 'optimize': True})]
+DEFAULT_PROFILE_PICTURES = {'default.jpg', 'placeholderAvatar.jpg'}
+DEFAULT_AVATAR_URL = 'https://lift-ftb.s3.amazonaws.com/profile_pictures/placeholderAvatar.jpg'
+# Bump to re-render every avatar when sizes, formats or quality change
+AVATAR_VERSION = 1
+# Avatar keys are content hashes, so an object never changes once uploaded
+AVATAR_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# The sweep leaves objects this recent alone; a job may be about to point a user at them
+ORPHAN_GRACE_PERIOD = timedelta(hours=1)
+# Stashed uploads older than this belong to jobs that gave up
+STASH_MAX_AGE = timedelta(days=1)
+
+# profile_picture holds the largest JPEG derivative; the other files differ only in size and extension
+_DERIVATIVE_URL = re.compile(rf'^(?P<base>.+)-{AVATAR_SIZES[-1]}\.jpg$')
+_DERIVATIVE_FILE = re.compile(r'^(?P<base>.+)-\d+\.(webp|jpg)$')
+_LOCAL_AVATAR_FILE = re.compile(r'^[0-9a-f]{32}-\d+\.(webp|jpg)$')
+
+
+def upload_size(file):
+    """Size of an uploaded file, found by seeking rather than reading it."""
+    stream = file.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+
+def is_image(file):
+    """Whether the upload looks like an image PIL can open; only the header is read."""
+    try:
+        Image.open(file.stream)
+    except (UnidentifiedImageError, OSError):
+        return False
+    finally:
+        file.stream.seek(0)
+    return True
+
+
+def _pending_folder():
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'pending')
+
+
+def stash_upload(file, user_id):
+    """Store the raw upload where the worker can reach it and return its key.
+
+    In production that is S3 (the worker runs on another machine);
+    locally it is a folder next to the profile pictures.
+    """
+    upload_key = f"uploads/{user_id}/{uuid.uuid4().hex}"
+    if current_app.env == 'production':
+        if upload_fileobj_to_s3(file.stream, upload_key) is None:
+            raise Exception('Error uploading to S3')
+    else:
+        os.makedirs(_pending_folder(), exist_ok=True)
+        file.save(os.path.join(_pending_folder(), os.path.basename(upload_key)))
+    return upload_key
+
+
+def _open_upload(upload_key):
+    if current_app.env == 'production':
+        return download_fileobj_from_s3(upload_key)
+    with open(os.path.join(_pending_folder(), os.path.basename(upload_key)), 'rb') as f:
+        return io.BytesIO(f.read())
+
+
+def _discard_upload(upload_key):
+    if current_app.env == 'production':
+        delete_file_from_s3(upload_key)
+    else:
+        path = os.path.join(_pending_folder(), os.path.basename(upload_key))
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def resize_and_crop(image, size):
+    """Resize and crop an image to fill the specified size."""
+    # Scale so the image covers size, then trim the overflow evenly from both sides
+    return ImageOps.fit(image, size, Image.LANCZOS)
+
+
+def avatar_url(base, size, extension):
+    return f"{base}-{size}.{extension}"
+
+
+def avatar_sources(profile_picture):
+    """srcset strings for a profile picture's derivatives, or None for a single (legacy or default) image."""
+    match = _DERIVATIVE_URL.match(profile_picture or '')
+    if not match:
+        return None
+    base = match.group('base')
+    sources = {
+        extension: ', '.join(f"{avatar_url(base, size, extension)} {size}w" for size in AVATAR_SIZES)
+        for _, extension, _ in AVATAR_FORMATS
+    }
+    sources['fallback'] = profile_picture
+    return sources
+
+
+def enqueue_profile_picture(user_id, upload_key):
+    return enqueue('profile_picture', {'user_id': user_id, 'upload_key': upload_key}, user_id=user_id)
+
+
+def enqueue_avatar_sweep():
+    return enqueue('avatar_sweep', {}, dedupe_key='avatar_sweep')
+
+
+def _render_derivatives(img):
+    """Yield (size, extension, content_type, data) for every avatar derivative of img."""
+    for size in AVATAR_SIZES:
+        square = resize_and_crop(img, (size, size))
+        for image_format, extension, options in AVATAR_FORMATS:
+            converted = square if image_format == 'WEBP' or square.mode == 'RGB' else square.convert('RGB')
+            in_mem_file = io.BytesIO()
+            converted.save(in_mem_file, format=image_format, **options)
+            yield size, extension, Image.MIME[image_format], in_mem_file.getvalue()
+
+
+def _avatar_base(digest):
+    if current_app.env == 'production':
+        return s3_url(f"avatars/{digest}")
+    return f"{current_app.static_url_path}/profile_pictures/{digest}"
+
+
+def _store_derivatives(img, digest):
+    for size, extension, content_type, data in _render_derivatives(img):
+        name = avatar_url(digest, size, extension)
+        if current_app.env == 'production':
+            if upload_fileobj_to_s3(io.BytesIO(data), f"avatars/{name}", content_type=content_type,
+                                    cache_control=AVATAR_CACHE_CONTROL) is None:
+                raise Exception('Error uploading to S3')
+        else:
+            with open(os.path.join(current_app.config['UPLOAD_FOLDER'], name), 'wb') as f:
+                f.write(data)
+
+
+def _refresh_derivatives(digest):
+    """Make a digest's stored files look new to the sweep; False if any of them is missing."""
+    for size in AVATAR_SIZES:
+        for image_format, extension, _ in AVATAR_FORMATS:
+            name = avatar_url(digest, size, extension)
+            if current_app.env == 'production':
+                if not touch_s3_object(f"avatars/{name}", content_type=Image.MIME[image_format],
+                                       cache_control=AVATAR_CACHE_CONTROL):
+                    return False
+            else:
+                try:
+                    os.utime(os.path.join(current_app.config['UPLOAD_FOLDER'], name))
+                except FileNotFoundError:
+                    return False
+    return True
+
+
+def _decode_upload(raw, upload_key):
+    try:
+        img = Image.open(io.BytesIO(raw))
+        # For JPEGs, let the decoder scale down by a power of two instead of decoding full size
+        largest = AVATAR_SIZES[-1]
+        img.draft('RGB', (largest, largest))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+    # A bomb (a small file declaring a huge pixel count) isn't an OSError, but retrying can't help either
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        _discard_upload(upload_key)
+        raise PermanentJobError(f'Could not read the image: {str(e)}')
+    return img
+
+
+@job_handler('profile_picture')
+def process_profile_picture(user_id, upload_key):
+    """Render a stashed upload's avatar derivatives, store them and switch the user over.
+
+    Derivatives are keyed by a hash of the uploaded bytes. If another user
+    already has the same picture, its files are reused: they are refreshed
+    rather than re-rendered, so the sweep treats them as new.
+    """
+    raw = _open_upload(upload_key).getvalue()
+    digest = hashlib.sha256(f"v{AVATAR_VERSION}:".encode() + raw).hexdigest()[:32]
+    file_url = avatar_url(_avatar_base(digest), AVATAR_SIZES[-1], 'jpg')
+
+    shared = User.query.filter(User.profile_picture == file_url, User.id != user_id).first()
+    # Fresh uploads keep a concurrent sweep off the files until this user points at them
+    if not (shared and _refresh_derivatives(digest)):
+        _store_derivatives(_decode_upload(raw, upload_key), digest)
+
+    user = db.session.get(User, user_id)
+    if user and user.profile_picture != file_url:
+        user.profile_picture = file_url
+        db.session.commit()
+        # The previous picture is removed by the sweep, not here: another user may share it
+        enqueue_avatar_sweep()
+
+    # A sweep that listed the files before they were refreshed can still have removed them
+    if not _refresh_derivatives(digest):
+        _store_derivatives(_decode_upload(raw, upload_key), digest)
+    _discard_upload(upload_key)
+
+
+def _referenced_pictures():
+    referenced = set()
+    for (picture,) in db.session.query(User.profile_picture).distinct():
+        match = _DERIVATIVE_URL.match(picture or '')
+        referenced.add(match.group('base') if match else picture)
+    return referenced
+
+
+def _is_referenced(url, referenced):
+    match = _DERIVATIVE_FILE.match(url)
+    return url in referenced or (match is not None and match.group('base') in referenced)
+
+
+@job_handler('avatar_sweep')
+def sweep_orphaned_avatars():
+    """Delete stored avatars no user points at any more, and abandoned upload stashes.
+
+    Returns the number of files removed.
+    """
+    now = datetime.now(timezone.utc)
+    referenced = _referenced_pictures()
+    removed = 0
+
+    if current_app.env == 'production':
+        # Legacy per-user keys (profile_pictures/<user id>/...) are swept too; the shared placeholder isn't
+        for prefix in ('avatars/', 'profile_pictures/'):
+            for key, last_modified in list_s3_objects(prefix):
+                if prefix == 'profile_pictures/' and not re.match(r'^profile_pictures/\d+/', key):
+                    continue
+                if now - last_modified < ORPHAN_GRACE_PERIOD or _is_referenced(s3_url(key), referenced):
+                    continue
+                if delete_file_from_s3(key):
+                    removed += 1
+        for key, last_modified in list_s3_objects('uploads/'):
+            if now - last_modified >= STASH_MAX_AGE and delete_file_from_s3(key):
+                removed += 1
+        return removed
+
+    folder = current_app.config['UPLOAD_FOLDER']
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if not _LOCAL_AVATAR_FILE.match(name):
+            continue
+        age = now - datetime.fromtimestamp(os.path.getmtime(path), timezone.utc)
+        if age < ORPHAN_GRACE_PERIOD or _is_referenced(f"{_avatar_base('')}{name}", referenced):
+            continue
+        os.remove(path)
+        removed += 1
+    if os.path.isdir(_pending_folder()):
+        for name in os.listdir(_pending_folder()):
+            path = os.path.join(_pending_folder(), name)
+            if now - datetime.fromtimestamp(os.path.getmtime(path), timezone.utc) >= STASH_MAX_AGE:
+                os.remove(path)
+                removed += 1
+    return removed
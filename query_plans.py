@@ -0,0 +1,61 @@
+from datetime import date
+from sqlalchemy import select, text
+from extensions import db
+from models import Workout, Set, StravaWorkout, WeeklyWorkout, WeeklyWorkoutDay, WorkoutTemplateExercise, DailyVolume, PersonalRecord
+
+
+def hot_queries():
+    """The filters the busiest pages run, with representative parameters."""
+    today = date.today()
+    return {
+        'profile workouts': select(Workout).where(Workout.user_id == 1).order_by(Workout.date.desc()),
+        'sets for workout': select(Set).where(Set.workout_id == 1),
+        'sets for exercise': select(Set).where(Set.exercise_id == 1),
+        'profile strava workouts': select(StravaWorkout).where(StravaWorkout.user_id == 1)
+            .order_by(StravaWorkout.start_date.desc()),
+        'latest weekly workout': select(WeeklyWorkout).order_by(WeeklyWorkout.week_start_date.desc()).limit(1),
+        'weekly workout days': select(WeeklyWorkoutDay).where(WeeklyWorkoutDay.weekly_workout_id.in_([1, 2])),
+        'template exercises': select(WorkoutTemplateExercise).where(WorkoutTemplateExercise.template_id == 1),
+        'leaderboard period': select(DailyVolume).where(DailyVolume.date >= today.replace(day=1)),
+        'leaderboard muscle group': select(DailyVolume).where(
+            DailyVolume.muscle_group == 'Chest', DailyVolume.date >= today.replace(day=1)),
+        'exercise records': select(PersonalRecord).where(PersonalRecord.exercise_id == 1)
+            .order_by(PersonalRecord.best_e1rm.desc()).limit(10),
+        'profile records': select(PersonalRecord).where(PersonalRecord.user_id == 1),
+    }
+
+
+def _explain(statement):
+    compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+    if db.engine.dialect.name == 'sqlite':
+        rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {compiled}')).all()
+        return [row[-1] for row in rows]
+    rows = db.session.execute(text(f'EXPLAIN {compiled}')).all()
+    return [row[0] for row in rows]
+
+
+def _is_sequential_scan(plan_line):
+    if db.engine.dialect.name == 'sqlite':
+        # "SCAN set" is a full table scan; "SCAN x USING INDEX ..." is not
+        return plan_line.startswith('SCAN') and 'USING' not in plan_line
+    return 'Seq Scan' in plan_line
+
+
+def find_sequential_scans():
+    """Return {query name: plan} for every hot query that scans a whole table.
+
+    On Postgres, sequential scans are disabled for the check so the planner
+    only picks one when no usable index exists, however small the tables are.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text('SET LOCAL enable_seqscan = off'))
+
+    failures = {}
+    try:
+        for name, statement in hot_queries().items():
+            plan = _explain(statement)
+            if any(_is_sequential_scan(line.strip()) for line in plan):
+                failures[name] = plan
+    finally:
+        db.session.rollback()
+    return failures
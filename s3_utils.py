@@ -2,59 +2,95 @@ import boto3
 from botocore.exceptions import ClientError, ParamValidationError
 from flask import current_app
 import logging
-from werkzeug.utils import secure_filename
+import threading
 from botocore.config import Config
-from PIL import Image
 import io
 
 logging.basicConfig(level=logging.DEBUG)
 
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
 def get_s3_client():
-    return boto3.client('s3', config=Config(s3={'addressing_style': 'path'}))
+    """Return the process-wide S3 client, creating it on first use.
+
+    Building a client resolves credentials and loads endpoint data, and
+    each one has its own connection pool, so every upload and delete in
+    a worker shares one. boto3 clients are thread-safe. It is created
+    lazily so that each forked gunicorn worker gets its own client.
+    """
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                config = current_app.config
+                _s3_client = boto3.session.Session().client(
+                    's3',
+                    endpoint_url=config.get('S3_ENDPOINT_URL'),
+                    config=Config(
+                        s3={'addressing_style': 'path'},
+                        max_pool_connections=config.get('S3_MAX_POOL_CONNECTIONS', 10),
+                        retries={'max_attempts': config.get('S3_MAX_ATTEMPTS', 3), 'mode': 'standard'}
+                    )
+                )
+    return _s3_client
 
-def upload_file_to_s3(file, user_id):
-    from app import db, User
-    
-    if file:
-        s3_client = get_s3_client()
-        bucket_name = current_app.config['S3_BUCKET']
-        
-        # Resize image
-        img = Image.open(file)
-        img.thumbnail((500, 375))  # Resize to max 500x375 while maintaining aspect ratio
-        
-        # Save to in-memory file
-        in_mem_file = io.BytesIO()
-        img.save(in_mem_file, format=img.format)
-        in_mem_file.seek(0)
-        
-        # Generate a unique filename
-        file_name = f"profile_pictures/{user_id}/{secure_filename(file.filename)}"
-        
-        try:
-            # Upload resized image
-            s3_client.upload_fileobj(
-                in_mem_file,
-                bucket_name,
-                file_name,
-                ExtraArgs={'ACL': 'public-read'}
-            )
-            file_url = f"https://{bucket_name}.s3.amazonaws.com/{file_name}"
-            
-            current_app.logger.info(f"Uploaded file URL: {file_url}")
-        except ClientError as e:
-            current_app.logger.error(f"Error uploading file: {str(e)}")
-            return None
-    else:
-        # Use placeholder avatar if no file is provided
-        file_url = 'placeholderAvatar.jpg'
+def s3_url(key):
+    return f"https://{current_app.config['S3_BUCKET']}.s3.amazonaws.com/{key}"
 
-    user = User.query.get(user_id)
-    if user:
-        user.profile_picture = file_url
-        db.session.commit()
+def upload_fileobj_to_s3(fileobj, key, content_type=None, cache_control=None):
+    """Stream a file object to the bucket under key and return its public URL, or None on error."""
+    bucket_name = current_app.config['S3_BUCKET']
+    extra_args = {'ACL': 'public-read'}
+    if content_type:
+        extra_args['ContentType'] = content_type
+    if cache_control:
+        extra_args['CacheControl'] = cache_control
+
+    try:
+        get_s3_client().upload_fileobj(fileobj, bucket_name, key, ExtraArgs=extra_args)
+    except ClientError as e:
+        current_app.logger.error(f"Error uploading file: {str(e)}")
+        return None
+    file_url = s3_url(key)
+    current_app.logger.info(f"Uploaded file URL: {file_url}")
     return file_url
 
+def touch_s3_object(key, content_type=None, cache_control=None):
+    """Copy an object onto itself so its LastModified is now; False if it is missing or the copy fails.
+
+    S3 only allows an in-place copy that replaces the metadata, so the
+    content type and cache headers are passed again.
+    """
+    bucket_name = current_app.config['S3_BUCKET']
+    extra_args = {'ACL': 'public-read', 'MetadataDirective': 'REPLACE'}
+    if content_type:
+        extra_args['ContentType'] = content_type
+    if cache_control:
+        extra_args['CacheControl'] = cache_control
+
+    try:
+        get_s3_client().copy_object(Bucket=bucket_name, Key=key,
+                                    CopySource={'Bucket': bucket_name, 'Key': key}, **extra_args)
+    except ClientError as e:
+        current_app.logger.info(f"Could not refresh {key}: {str(e)}")
+        return False
+    return True
+
+def download_fileobj_from_s3(key):
+    """Return the object under key as an in-memory file."""
+    in_mem_file = io.BytesIO()
+    get_s3_client().download_fileobj(current_app.config['S3_BUCKET'], key, in_mem_file)
+    in_mem_file.seek(0)
+    return in_mem_file
+
+def list_s3_objects(prefix):
+    """Yield (key, last_modified) for every object under prefix."""
+    paginator = get_s3_client().get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=current_app.config['S3_BUCKET'], Prefix=prefix):
+        for obj in page.get('Contents', []):
+            yield obj['Key'], obj['LastModified']
+
 def delete_file_from_s3(filename):
     s3 = get_s3_client()
     try:
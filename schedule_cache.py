@@ -0,0 +1,91 @@
+from collections import namedtuple
+from extensions import db
+from models import Exercise, WeeklyWorkout, WeeklyWorkoutDay, WorkoutTemplate, WorkoutTemplateExercise
+from cache_versions import VersionedCache, register_cache, current_cache_version
+
+SuggestedWorkout = namedtuple('SuggestedWorkout', ['id', 'name', 'exercises'])
+SuggestedExercise = namedtuple('SuggestedExercise', ['name', 'sets', 'reps'])
+
+
+def _load_suggested_workout(today):
+    """Resolve the template scheduled for today, with its exercises, or None for a rest day."""
+    latest_week_id = db.session.query(WeeklyWorkout.id).order_by(
+        WeeklyWorkout.week_start_date.desc()).limit(1).scalar_subquery()
+    template_id = db.session.query(WeeklyWorkoutDay.template_id).filter(
+        WeeklyWorkoutDay.weekly_workout_id == latest_week_id,
+        WeeklyWorkoutDay.weekday == today.weekday()
+    ).scalar()
+    if not template_id:
+        return None
+
+    rows = db.session.query(
+        WorkoutTemplate.name,
+        Exercise.name,
+        WorkoutTemplateExercise.sets,
+        WorkoutTemplateExercise.reps
+    ).select_from(WorkoutTemplate).outerjoin(
+        WorkoutTemplateExercise, WorkoutTemplateExercise.template_id == WorkoutTemplate.id
+    ).outerjoin(Exercise, Exercise.id == WorkoutTemplateExercise.exercise_id).filter(
+        WorkoutTemplate.id == template_id
+    ).order_by(WorkoutTemplateExercise.id).all()
+    if not rows:
+        return None
+
+    exercises = tuple(
+        SuggestedExercise(exercise_name, sets, reps)
+        for _, exercise_name, sets, reps in rows if exercise_name is not None
+    )
+    return SuggestedWorkout(template_id, rows[0][0], exercises)
+
+
+class ScheduleCache(VersionedCache):
+    """Per-process cache of the workout suggested on the home page.
+
+    One entry is kept, keyed by date, so the next day resolves afresh. ORM
+    writes to the weekly schedule, templates, their exercises or exercise
+    names bump the 'schedule' version, and every process drops its entry
+    once that write has committed.
+    """
+
+    version_name = 'schedule'
+
+    def __init__(self):
+        super().__init__()
+        self._entry = None
+        self.hits = 0
+        self.misses = 0
+
+    def _clear(self):
+        self._entry = None
+
+    def suggested_workout(self, today):
+        """The SuggestedWorkout for today's date, or None if nothing is scheduled."""
+        version = current_cache_version(self.version_name)
+        with self._lock:
+            self._sync(version)
+            if self._entry is not None and self._entry[0] == today:
+                self.hits += 1
+                return self._entry[1]
+            self.misses += 1
+            generation = self._generation
+
+        workout = _load_suggested_workout(today)
+
+        with self._lock:
+            # Don't cache a schedule that a concurrent write has already made stale
+            if generation == self._generation:
+                self._entry = (today, workout)
+        return workout
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'date': self._entry[0].isoformat() if self._entry else None,
+                'version': self._version,
+            }
+
+
+schedule_cache = ScheduleCache()
+register_cache(schedule_cache, models=(WeeklyWorkout, WeeklyWorkoutDay, WorkoutTemplate, WorkoutTemplateExercise, Exercise))
@@ -0,0 +1,32 @@
+from sqlalchemy import func
+from extensions import db
+from models import User, DailyVolume
+
+
+def total_scores():
+    """Subquery of (user_id, total_score): each user's all-time volume, from the rollup."""
+    return db.session.query(
+        DailyVolume.user_id,
+        func.sum(DailyVolume.total_volume).label('total_score')
+    ).group_by(DailyVolume.user_id).subquery()
+
+
+def ranked_roster(page, per_page):
+    """One page of users ordered by total score, and whether there is a next page.
+
+    Rows are (id, username, profile_picture, total_score, rank). Ranks come
+    from a window over all users, so they're the same whichever page a user
+    lands on; tied scores share a rank and ties are listed by user id.
+    """
+    scores = total_scores()
+    total_score = func.coalesce(scores.c.total_score, 0)
+    rows = db.session.query(
+        User.id,
+        User.username,
+        User.profile_picture,
+        total_score.label('total_score'),
+        func.rank().over(order_by=total_score.desc()).label('rank')
+    ).outerjoin(scores, scores.c.user_id == User.id).order_by(
+        total_score.desc(), User.id
+    ).offset((page - 1) * per_page).limit(per_page + 1).all()
+    return rows[:per_page], len(rows) > per_page
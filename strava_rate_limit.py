@@ -0,0 +1,71 @@
+import threading
+from datetime import datetime, timedelta
+from stravalib.util.limiter import get_rates_from_response_headers
+from jobs import RetryJobLater
+
+# Share of each budget that bulk work (backfills) leaves for imports and webhook fetches
+BULK_RESERVE = 0.2
+
+
+def _next_quarter(moment):
+    # Strava's short window resets on the quarter hour (UTC)
+    quarter = moment.replace(minute=moment.minute - moment.minute % 15, second=0, microsecond=0)
+    return quarter + timedelta(minutes=15)
+
+
+def _next_day(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+
+class StravaBudget:
+    """The app's Strava request budget, as last reported by Strava.
+
+    Strava limits requests per application, per 15 minutes and per day,
+    and every response reports the app-wide usage. Instances are passed to
+    stravalib as its rate_limiter, so each response updates the view that
+    all worker threads share. Unlike stravalib's own limiter this never
+    sleeps: callers check the budget first and defer their job until the
+    window resets.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rates = None
+        self._observed_at = None
+
+    def __call__(self, response_headers, method):
+        rates = get_rates_from_response_headers(response_headers, method)
+        if rates:
+            with self._lock:
+                self._rates = rates
+                self._observed_at = datetime.utcnow()
+
+    def next_request_at(self, reserve=0.0, now=None):
+        """When a request may next be made, keeping `reserve` of each budget unused; None means now."""
+        now = now or datetime.utcnow()
+        with self._lock:
+            rates, observed_at = self._rates, self._observed_at
+        if rates is None:
+            return None
+
+        day_reset = _next_day(observed_at)
+        if now < day_reset and rates.long_usage >= rates.long_limit * (1 - reserve):
+            return day_reset
+        short_reset = _next_quarter(observed_at)
+        if now < short_reset and rates.short_usage >= rates.short_limit * (1 - reserve):
+            return short_reset
+        return None
+
+    def check(self, reserve=0.0):
+        """Defer the running job (via RetryJobLater) if the budget is spent."""
+        retry_at = self.next_request_at(reserve)
+        if retry_at:
+            raise RetryJobLater(retry_at, 'Strava rate limit reached')
+
+    def rate_limited(self):
+        """The RetryJobLater to raise after Strava answered 429 Too Many Requests."""
+        return RetryJobLater(self.next_request_at() or _next_quarter(datetime.utcnow()),
+                             'Strava rate limit exceeded')
+
+
+strava_budget = StravaBudget()
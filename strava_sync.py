@@ -0,0 +1,294 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from sqlalchemy import insert
+from stravalib.exc import AccessUnauthorized, Fault, ObjectNotFound
+from extensions import db, dialect_insert
+from models import StravaAccount, StravaWorkout
+from jobs import job_handler, enqueue, PermanentJobError, RetryJobLater
+from strava_tokens import get_strava_client
+from strava_rate_limit import strava_budget, BULK_RESERVE
+
+IMPORT_BATCH_SIZE = 100
+BACKFILL_PAGE_SIZE = 200
+INITIAL_SYNC_DAYS = 30
+# A backfill goes to the back of the queue after this many pages, so one long history can't hog a worker
+BACKFILL_PAGES_PER_RUN = 5
+
+UPDATABLE_COLUMNS = ['name', 'type', 'start_date', 'distance', 'moving_time', 'average_speed', 'total_elevation_gain']
+
+
+def activity_to_row(user_id, activity):
+    return {
+        'user_id': user_id,
+        'strava_id': str(activity.id),
+        'name': activity.name,
+        'type': str(activity.type),
+        'start_date': activity.start_date,
+        'distance': float(activity.distance),
+        'moving_time': int(activity.moving_time),
+        'average_speed': float(activity.average_speed),
+        'total_elevation_gain': float(activity.total_elevation_gain)
+    }
+
+
+def upsert_strava_workouts(rows, update=False):
+    """Insert StravaWorkout rows in one statement, keyed on strava_id.
+
+    Rows whose strava_id already exists are left alone, or overwritten when
+    update=True. A concurrent import of the same activity can't make this
+    fail on the unique constraint.
+    """
+    # A single statement may not touch the same key twice (Postgres rejects it)
+    rows = list({row['strava_id']: row for row in rows}.values())
+    if not rows:
+        return
+    upsert = dialect_insert(StravaWorkout)
+    if upsert is None:
+        existing = {strava_id for (strava_id,) in db.session.query(StravaWorkout.strava_id).filter(
+            StravaWorkout.strava_id.in_([row['strava_id'] for row in rows]))}
+        missing = [row for row in rows if row['strava_id'] not in existing]
+        if missing:
+            db.session.execute(insert(StravaWorkout), missing)
+        return
+
+    upsert = upsert.values(rows)
+    if update:
+        upsert = upsert.on_conflict_do_update(
+            index_elements=['strava_id'],
+            set_={column: upsert.excluded[column] for column in UPDATABLE_COLUMNS},
+            # Never let one user's import overwrite another user's activity
+            where=StravaWorkout.user_id == upsert.excluded.user_id
+        )
+    else:
+        upsert = upsert.on_conflict_do_nothing(index_elements=['strava_id'])
+    db.session.execute(upsert)
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _naive_utc(value):
+    """Strava returns aware datetimes; the DateTime columns store naive UTC."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _import_batch(user_id, batch):
+    """Store one batch of activities and return their (earliest, latest) start times."""
+    # One query per batch to find the activities we already have
+    strava_ids = [str(activity.id) for activity in batch]
+    existing_ids = {strava_id for (strava_id,) in db.session.query(StravaWorkout.strava_id).filter(
+        StravaWorkout.strava_id.in_(strava_ids))}
+    upsert_strava_workouts([
+        activity_to_row(user_id, activity) for activity in batch
+        if str(activity.id) not in existing_ids
+    ])
+    start_dates = [_naive_utc(activity.start_date) for activity in batch]
+    return min(start_dates), max(start_dates)
+
+
+def _remember_athlete_id(strava_account, client):
+    # Accounts connected before webhooks existed don't know their athlete id yet
+    if strava_account.athlete_id is None:
+        strava_account.athlete_id = client.get_athlete().id
+
+
+def _get_strava_account(user_id):
+    strava_account = StravaAccount.query.filter_by(user_id=user_id).first()
+    if not strava_account:
+        raise PermanentJobError('Strava account is not connected')
+    return strava_account
+
+
+@contextmanager
+def _strava_errors():
+    """Turn Strava API errors into the job outcomes they call for."""
+    try:
+        yield
+    except AccessUnauthorized:
+        raise PermanentJobError('Strava access token expired. Please reconnect your account.')
+    except Fault as e:
+        if e.response is not None and e.response.status_code == 429:
+            raise strava_budget.rate_limited()
+        raise
+
+
+def enqueue_strava_import(user_id):
+    """Queue an import for the user, or return the one already queued."""
+    return enqueue('strava_import', {'user_id': user_id}, user_id=user_id,
+                   dedupe_key=f'strava_import:{user_id}')
+
+
+def enqueue_strava_backfill(user_id):
+    """Queue a full-history backfill for the user, or return the one already queued."""
+    return enqueue('strava_backfill', {'user_id': user_id}, user_id=user_id,
+                   dedupe_key=f'strava_backfill:{user_id}')
+
+
+@job_handler('strava_import')
+def import_strava_workouts(user_id):
+    """Import the activities newer than the account's sync cursor.
+
+    The first sync (no cursor yet) looks back 30 days; older history is
+    left to the backfill. Activities that are already stored are skipped,
+    so running the job again (e.g. on retry) is safe.
+    """
+    strava_account = _get_strava_account(user_id)
+    after = strava_account.last_activity_at or datetime.utcnow() - timedelta(days=INITIAL_SYNC_DAYS)
+
+    with _strava_errors():
+        strava_budget.check()
+        client = get_strava_client(strava_account)
+        _remember_athlete_id(strava_account, client)
+        activities = client.get_activities(after=after)
+        for batch in _batches(activities, IMPORT_BATCH_SIZE):
+            _, latest = _import_batch(user_id, batch)
+            # Advance the cursor with each batch so a failed job resumes where it stopped
+            if strava_account.last_activity_at is None or latest > strava_account.last_activity_at:
+                strava_account.last_activity_at = latest
+            db.session.commit()
+            strava_budget.check()
+
+
+@job_handler('strava_backfill')
+def backfill_strava_workouts(user_id):
+    """Walk the account's whole Strava history, newest to oldest, one page at a time.
+
+    The backfill cursor is committed after every page, so a retried,
+    restarted or deferred job picks up from the last page it finished.
+    Backfills leave part of the rate-limit budget to imports and webhook
+    fetches.
+    """
+    strava_account = _get_strava_account(user_id)
+
+    with _strava_errors():
+        for _ in range(BACKFILL_PAGES_PER_RUN):
+            if strava_account.backfill_complete:
+                return
+            strava_budget.check(reserve=BULK_RESERVE)
+            # A long backfill can outlive a token, so check it before every page
+            client = get_strava_client(strava_account)
+            before = strava_account.backfill_before or datetime.utcnow()
+            page = list(client.get_activities(before=before, limit=BACKFILL_PAGE_SIZE))
+
+            if page:
+                earliest, latest = _import_batch(user_id, page)
+                strava_account.backfill_before = earliest
+                if strava_account.last_activity_at is None or latest > strava_account.last_activity_at:
+                    strava_account.last_activity_at = latest
+            if len(page) < BACKFILL_PAGE_SIZE:
+                strava_account.backfill_complete = True
+            db.session.commit()
+
+        if not strava_account.backfill_complete:
+            raise RetryJobLater(datetime.utcnow(), 'Yielding to other jobs')
+
+
+def enqueue_strava_activity_sync(user_id, activity_id):
+    """Queue a fetch of one activity; repeated events for it share the queued job."""
+    return enqueue('strava_activity', {'user_id': user_id, 'activity_id': activity_id}, user_id=user_id,
+                   dedupe_key=f'strava_activity:{activity_id}')
+
+
+def enqueue_strava_deauthorization(user_id):
+    """Queue a check of whether the athlete really revoked our access."""
+    return enqueue('strava_deauthorization', {'user_id': user_id}, user_id=user_id,
+                   dedupe_key=f'strava_deauthorization:{user_id}')
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def handle_webhook_event(event):
+    """Queue the work for one Strava webhook event.
+
+    Events aren't signed, so nothing in one is applied as it stands: every
+    activity event (deletes included) queues a fetch of the activity, and a
+    deauthorization queues a check with Strava. That also keeps the answer
+    within Strava's two-second deadline. Events for athletes we don't know
+    are ignored.
+    """
+    owner_id = event.get('owner_id')
+    # athlete_id=None would match every account connected before webhooks existed
+    if not _is_int(owner_id):
+        return
+    strava_account = StravaAccount.query.filter_by(athlete_id=owner_id).first()
+    if not strava_account:
+        return
+
+    object_type = event.get('object_type')
+    aspect_type = event.get('aspect_type')
+    if object_type == 'activity':
+        activity_id = event.get('object_id')
+        # A deleted activity answers 404 to the fetch, which removes our copy
+        if _is_int(activity_id) and aspect_type in ('create', 'update', 'delete'):
+            enqueue_strava_activity_sync(strava_account.user_id, activity_id)
+    elif object_type == 'athlete' and (event.get('updates') or {}).get('authorized') == 'false':
+        enqueue_strava_deauthorization(strava_account.user_id)
+
+
+@job_handler('strava_activity')
+def sync_strava_activity(user_id, activity_id):
+    """Fetch one activity and store its current state, overwriting what we had."""
+    strava_account = _get_strava_account(user_id)
+
+    with _strava_errors():
+        strava_budget.check()
+        client = get_strava_client(strava_account)
+        try:
+            activity = client.get_activity(activity_id)
+        except ObjectNotFound:
+            # Deleted or made private since the event was sent
+            StravaWorkout.query.filter_by(user_id=user_id, strava_id=str(activity_id)).delete()
+            db.session.commit()
+            return
+
+    upsert_strava_workouts([activity_to_row(user_id, activity)], update=True)
+    db.session.commit()
+
+
+def _access_revoked(error):
+    """Whether a Strava error means the athlete has revoked our access."""
+    if isinstance(error, AccessUnauthorized):
+        return True
+    # A revoked refresh token is refused with 400 Bad Request by the token endpoint
+    if isinstance(error, Fault) and error.response is not None and error.response.status_code == 400:
+        try:
+            errors = error.response.json().get('errors') or []
+        except ValueError:
+            return False
+        return any(e.get('resource') == 'RefreshToken' for e in errors)
+    return False
+
+
+@job_handler('strava_deauthorization')
+def confirm_strava_deauthorization(user_id):
+    """Disconnect the account, like /strava/disconnect, once Strava confirms our access is gone.
+
+    A forged event finds the token still working and changes nothing.
+    """
+    strava_account = StravaAccount.query.filter_by(user_id=user_id).first()
+    if not strava_account:
+        return
+
+    with _strava_errors():
+        strava_budget.check()
+        try:
+            get_strava_client(strava_account).get_athlete()
+            return
+        except (AccessUnauthorized, Fault) as e:
+            if not _access_revoked(e):
+                raise
+
+    StravaWorkout.query.filter_by(user_id=user_id).delete()
+    db.session.delete(strava_account)
+    db.session.commit()
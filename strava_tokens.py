@@ -0,0 +1,70 @@
+import threading
+from collections import defaultdict
+import requests
+from datetime import datetime, timedelta
+from flask import current_app
+from stravalib.client import Client
+from extensions import db
+from models import StravaAccount
+from strava_rate_limit import strava_budget
+
+# Refresh this long before the token actually expires
+REFRESH_MARGIN = timedelta(minutes=5)
+
+_locks = defaultdict(threading.Lock)
+_locks_guard = threading.Lock()
+
+# One pooled HTTP session for every Strava call in the process (tests mount a fake Strava on it)
+strava_session = requests.Session()
+
+
+def _account_lock(account_id):
+    with _locks_guard:
+        return _locks[account_id]
+
+
+def oauth_client():
+    """An unauthenticated Client, for the OAuth and webhook subscription endpoints."""
+    return Client(requests_session=strava_session)
+
+
+def token_needs_refresh(strava_account, now=None):
+    # token_expiry is stored in local time (datetime.fromtimestamp), so compare in local time
+    now = now or datetime.now()
+    return strava_account.token_expiry - REFRESH_MARGIN <= now
+
+
+def get_access_token(strava_account):
+    """Return a usable access token for the account, refreshing it if it is about to expire.
+
+    Refreshes are serialized per account: a thread lock covers this process
+    and a row lock (SELECT ... FOR UPDATE, where supported) covers the web and
+    worker processes. Whoever gets the lock second sees the new token and
+    skips the refresh. A refresh commits the session.
+    """
+    if not token_needs_refresh(strava_account):
+        return strava_account.access_token
+
+    with _account_lock(strava_account.id):
+        try:
+            account = StravaAccount.query.filter_by(id=strava_account.id).with_for_update().populate_existing().one()
+            if token_needs_refresh(account):
+                token_response = oauth_client().refresh_access_token(
+                    client_id=current_app.config['STRAVA_CLIENT_ID'],
+                    client_secret=current_app.config['STRAVA_CLIENT_SECRET'],
+                    refresh_token=account.refresh_token
+                )
+                account.access_token = token_response['access_token']
+                account.refresh_token = token_response['refresh_token']
+                account.token_expiry = datetime.fromtimestamp(token_response['expires_at'])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return account.access_token
+
+
+def get_strava_client(strava_account):
+    """A stravalib Client authenticated with a fresh token for the account."""
+    return Client(access_token=get_access_token(strava_account), rate_limiter=strava_budget,
+                  requests_session=strava_session)
@@ -0,0 +1,48 @@
+import hashlib
+import json
+from extensions import db
+from models import User, Exercise, WorkoutTemplate, WorkoutTemplateExercise
+from cache_versions import VersionedCache, register_cache, current_cache_version
+
+
+class TemplateCache(VersionedCache):
+    """Per-process cache of serialized templates for /load_template.
+
+    Any ORM write to a template, its exercises, an exercise name or a user
+    (the creator name is part of the payload) bumps the 'templates' version,
+    and every process drops its copy once that write has committed.
+    """
+
+    version_name = 'templates'
+
+    def __init__(self):
+        super().__init__()
+        self._payloads = {}
+
+    def _clear(self):
+        self._payloads.clear()
+
+    def get(self, template_id):
+        """Return (json payload, etag) for a template, or None if it doesn't exist."""
+        version = current_cache_version(self.version_name)
+        with self._lock:
+            self._sync(version)
+            if template_id in self._payloads:
+                return self._payloads[template_id]
+            generation = self._generation
+
+        template = db.session.get(WorkoutTemplate, template_id)
+        if template is None:
+            return None
+        payload = json.dumps(template.to_dict())
+        entry = (payload, hashlib.sha1(payload.encode('utf-8')).hexdigest())
+
+        with self._lock:
+            # Don't cache a payload that a concurrent write has already made stale
+            if generation == self._generation:
+                self._payloads[template_id] = entry
+        return entry
+
+
+template_cache = TemplateCache()
+register_cache(template_cache, models=(WorkoutTemplate, WorkoutTemplateExercise, Exercise, User))
@@ -0,0 +1,88 @@
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app.py reads the database URL when it is imported
+_db_dir = tempfile.mkdtemp()
+os.environ['DEVELOPMENT_DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+
+from app import app as flask_app
+from extensions import db
+from models import User, StravaAccount, Exercise
+from bootstrap import seed_exercises
+from strava_tokens import strava_session
+from tests.fake_strava import FakeStrava
+
+STRAVA_URL = 'https://www.strava.com/'
+
+
+@pytest.fixture
+def app():
+    flask_app.config.update(
+        TESTING=True,
+        SECRET_KEY='test',
+        STRAVA_CLIENT_ID='1',
+        STRAVA_CLIENT_SECRET='secret',
+        STRAVA_WEBHOOK_VERIFY_TOKEN='verify-token',
+        STRAVA_WEBHOOK_SUBSCRIPTION_ID='42',
+    )
+    with flask_app.app_context():
+        db.create_all()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def fake_strava():
+    fake = FakeStrava()
+    strava_session.mount(STRAVA_URL, fake)
+    yield fake
+    del strava_session.adapters[STRAVA_URL]
+
+
+@pytest.fixture
+def strava_user(app, fake_strava):
+    """A user connected to the fake Strava, returned as (user_id, account_id)."""
+    with app.app_context():
+        user = User(username='runner', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        account = StravaAccount(
+            user_id=user.id,
+            athlete_id=fake_strava.athlete_id,
+            access_token='access-0',
+            refresh_token='refresh-0',
+            token_expiry=datetime.now() + timedelta(hours=6),
+        )
+        db.session.add(account)
+        db.session.commit()
+        return user.id, account.id
+
+
+@pytest.fixture
+def exercises(app):
+    """The seeded exercise catalog, as {name: id}."""
+    with app.app_context():
+        seed_exercises()
+        return {exercise.name: exercise.id for exercise in Exercise.query}
+
+
+@pytest.fixture
+def lifter(app):
+    """A user and a test client logged in as them, returned as (client, user_id)."""
+    with app.app_context():
+        user = User(username='lifter', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    return client, user_id
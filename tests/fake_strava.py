@@ -0,0 +1,122 @@
+import json
+import re
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse, parse_qs
+from requests import Response
+from requests.adapters import BaseAdapter
+
+
+class FakeStrava(BaseAdapter):
+    """A local stand-in for www.strava.com.
+
+    Mounted on strava_tokens.strava_session, it answers the token endpoint
+    and the few API calls the app makes, and counts the requests it gets.
+    Tokens are handed out by the fake: refreshing issues access-N/refresh-N,
+    and revoke() makes every token it has issued stop working.
+    """
+
+    def __init__(self, athlete_id=1234, token_delay=0.0):
+        self._lock = threading.Lock()
+        self.athlete_id = athlete_id
+        # Seconds the token endpoint takes to answer, to widen race windows
+        self.token_delay = token_delay
+        self.valid_access_tokens = {'access-0'}
+        self.valid_refresh_tokens = {'refresh-0'}
+        self.refreshes = 0
+        self.requests = Counter()
+        self.activities = {}
+        # Called with the activity id after an activity has been served
+        self.after_activity_fetch = None
+
+    def revoke(self):
+        with self._lock:
+            self.valid_access_tokens.clear()
+            self.valid_refresh_tokens.clear()
+
+    def add_activity(self, activity_id, **fields):
+        activity = {
+            'id': activity_id,
+            'name': f'Activity {activity_id}',
+            'type': 'Run',
+            'sport_type': 'Run',
+            'start_date': '2026-10-01T07:00:00Z',
+            'distance': 5000.0,
+            'moving_time': 1500,
+            'elapsed_time': 1500,
+            'average_speed': 3.3,
+            'total_elevation_gain': 12.0,
+        }
+        activity.update(fields)
+        self.activities[activity_id] = activity
+
+    def send(self, request, **kwargs):
+        url = urlparse(request.url)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        route = f'{request.method} {url.path}'
+
+        with self._lock:
+            self.requests[re.sub(r'/\d+$', '/<id>', route)] += 1
+
+        if route == 'POST /oauth/token':
+            return self._token(request, params)
+
+        with self._lock:
+            authorized = params.get('access_token') in self.valid_access_tokens
+        if not authorized:
+            return self._response(request, 401, {
+                'message': 'Authorization Error',
+                'errors': [{'resource': 'Athlete', 'field': 'access_token', 'code': 'invalid'}]
+            })
+
+        if route == 'GET /api/v3/athlete':
+            return self._response(request, 200, {'id': self.athlete_id, 'firstname': 'Fake', 'lastname': 'Athlete'})
+        match = re.fullmatch(r'GET /api/v3/activities/(\d+)', route)
+        if match:
+            activity = self.activities.get(int(match.group(1)))
+            if activity is None:
+                return self._response(request, 404, {
+                    'message': 'Record Not Found',
+                    'errors': [{'resource': 'Activity', 'field': 'id', 'code': 'not found'}]
+                })
+            response = self._response(request, 200, activity)
+            if self.after_activity_fetch:
+                self.after_activity_fetch(activity['id'])
+            return response
+        return self._response(request, 404, {'message': 'Unknown route', 'errors': [route]})
+
+    def _token(self, request, params):
+        time.sleep(self.token_delay)
+        with self._lock:
+            if params.get('grant_type') != 'refresh_token' or params.get('refresh_token') not in self.valid_refresh_tokens:
+                return self._response(request, 400, {
+                    'message': 'Bad Request',
+                    'errors': [{'resource': 'RefreshToken', 'field': 'refresh_token', 'code': 'invalid'}]
+                })
+            self.refreshes += 1
+            access_token, refresh_token = f'access-{self.refreshes}', f'refresh-{self.refreshes}'
+            self.valid_refresh_tokens.discard(params['refresh_token'])
+            self.valid_access_tokens.add(access_token)
+            self.valid_refresh_tokens.add(refresh_token)
+        return self._response(request, 200, {
+            'token_type': 'Bearer',
+            'access_token': access_token,
+            'refresh_token': refresh_token,
+            'expires_at': int(time.time()) + 6 * 60 * 60,
+            'expires_in': 6 * 60 * 60,
+        })
+
+    def _response(self, request, status, body):
+        response = Response()
+        response.status_code = status
+        response.reason = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found'}[status]
+        response.headers['Content-Type'] = 'application/json'
+        response._content = json.dumps(body).encode('utf-8')
+        response.url = request.url
+        response.request = request
+        response.encoding = 'utf-8'
+        return response
+
+    def close(self):
+        pass
@@ -0,0 +1,31 @@
+from extensions import db
+from models import Workout
+
+
+def workout_form(day, entries):
+    """Form data for the add/edit workout routes.
+
+    entries are (exercise_id, weight, reps, sets) tuples, with a fifth set_id
+    item for rows that already exist when editing.
+    """
+    form = {'date': day, 'exercise_count': len(entries)}
+    for i, entry in enumerate(entries, start=1):
+        exercise_id, weight, reps, sets = entry[:4]
+        form.update({f'exercise_{i}': exercise_id, f'weight_{i}': weight, f'reps_{i}': reps, f'sets_{i}': sets})
+        if len(entry) > 4:
+            form[f'set_id_{i}'] = entry[4]
+    return form
+
+
+def add_workout(client, day, *entries):
+    """Log a workout through /add_workout and return its id."""
+    response = client.post('/add_workout', data=workout_form(day, entries))
+    assert response.status_code == 302
+    with client.application.app_context():
+        return db.session.query(db.func.max(Workout.id)).scalar()
+
+
+def edit_workout(client, workout_id, day, *entries):
+    response = client.post(f'/edit_workout/{workout_id}', data=workout_form(day, entries))
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/user_profile')
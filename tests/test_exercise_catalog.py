@@ -0,0 +1,67 @@
+import threading
+from sqlalchemy import insert, update
+from extensions import db
+from bootstrap import seed_exercises
+from models import CacheVersion, Exercise
+
+
+def _catalog(client):
+    response = client.get('/exercises')
+    assert response.status_code == 200
+    return {exercise['name'] for exercise in response.get_json()}, response.headers['ETag']
+
+
+def test_etag_answers_304_until_the_catalog_changes(app, exercises, lifter):
+    client, _ = lifter
+    names, etag = _catalog(client)
+    assert names == set(exercises)
+    assert client.get('/exercises', headers={'If-None-Match': etag}).status_code == 304
+
+    with app.app_context():
+        db.session.add(Exercise(name='Hip Thrust', muscle_group='Legs'))
+        db.session.commit()
+    names, new_etag = _catalog(client)
+    assert 'Hip Thrust' in names
+    assert new_etag != etag
+
+
+def test_a_load_between_flush_and_commit_is_not_kept(app, exercises, lifter):
+    client, _ = lifter
+    flushed, loaded = threading.Event(), threading.Event()
+
+    def add_exercise():
+        with app.app_context():
+            db.session.add(Exercise(name='Hip Thrust', muscle_group='Legs'))
+            db.session.flush()
+            flushed.set()
+            loaded.wait()
+            db.session.commit()
+
+    writer = threading.Thread(target=add_exercise)
+    writer.start()
+    flushed.wait()
+    assert 'Hip Thrust' not in _catalog(client)[0]
+    loaded.set()
+    writer.join()
+
+    assert 'Hip Thrust' in _catalog(client)[0]
+
+
+def test_writes_from_another_process_reach_the_catalog(app, exercises, lifter):
+    client, _ = lifter
+    assert 'Hip Thrust' not in _catalog(client)[0]
+
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(insert(Exercise).values(name='Hip Thrust', muscle_group='Legs'))
+            connection.execute(update(CacheVersion).where(CacheVersion.name == 'exercises')
+                               .values(version=CacheVersion.version + 1))
+
+    assert 'Hip Thrust' in _catalog(client)[0]
+
+
+def test_seeding_bumps_the_catalog_version(app, exercises):
+    with app.app_context():
+        version = db.session.get(CacheVersion, 'exercises').version
+        seed_exercises()
+        assert db.session.get(CacheVersion, 'exercises').version == version + 1
@@ -0,0 +1,78 @@
+from datetime import date
+from sqlalchemy import insert, update
+from extensions import db
+from leaderboard_cache import leaderboard_cache
+from models import CacheVersion, DailyVolume, User
+from volume_rollup import refresh_daily_volume
+
+
+def _add_workout(client, exercise_id, weight, reps=5, sets=1, day='2026-10-01'):
+    response = client.post('/add_workout', data={
+        'date': day,
+        'exercise_count': 1,
+        'exercise_1': exercise_id,
+        'weight_1': weight,
+        'reps_1': reps,
+        'sets_1': sets,
+    })
+    assert response.status_code == 302
+
+
+def _leaderboard(client):
+    return client.get('/leaderboard').get_data(as_text=True)
+
+
+def test_workout_writes_refresh_the_leaderboard(app, exercises, lifter):
+    client, _ = lifter
+    _add_workout(client, exercises['Squat'], 100)
+    assert '500.0 lbs' in _leaderboard(client)
+    misses = leaderboard_cache.stats()['misses']
+    assert '500.0 lbs' in _leaderboard(client)
+    assert leaderboard_cache.stats()['misses'] == misses
+
+    _add_workout(client, exercises['Squat'], 100, day='2026-10-02')
+    assert '1000.0 lbs' in _leaderboard(client)
+
+
+def test_writes_from_another_process_reach_the_cache(app, exercises, lifter):
+    client, _ = lifter
+    _add_workout(client, exercises['Squat'], 100)
+    assert '500.0 lbs' in _leaderboard(client)
+
+    # What a write from a worker or another dyno leaves behind: new rows and a bumped version,
+    # with nothing run in this process
+    with app.app_context():
+        with db.engine.begin() as connection:
+            user_id = connection.execute(insert(User).values(username='rival', password_hash='x')).inserted_primary_key[0]
+            connection.execute(insert(DailyVolume).values(
+                user_id=user_id, muscle_group='Legs', date=date(2026, 10, 1), total_volume=750.0))
+    assert 'rival' not in _leaderboard(client)
+
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(update(CacheVersion).where(CacheVersion.name == 'leaderboard')
+                               .values(version=CacheVersion.version + 1))
+    page = _leaderboard(client)
+    assert 'rival' in page
+    assert '750.0 lbs' in page
+
+
+def test_rebuilding_the_rollup_bumps_the_version(app, exercises, lifter):
+    client, _ = lifter
+    _add_workout(client, exercises['Squat'], 100)
+    with app.app_context():
+        version = db.session.get(CacheVersion, 'leaderboard').version
+
+    result = app.test_cli_runner().invoke(args=['rebuild-volume-rollup'])
+    assert result.exit_code == 0, result.output
+
+    with app.app_context():
+        assert db.session.get(CacheVersion, 'leaderboard').version == version + 1
+
+
+def test_a_rolled_back_write_leaves_the_version_alone(app, exercises, lifter):
+    _, user_id = lifter
+    with app.app_context():
+        refresh_daily_volume(user_id, [date(2026, 10, 1)])
+        db.session.rollback()
+        assert db.session.get(CacheVersion, 'leaderboard') is None
@@ -0,0 +1,71 @@
+from extensions import db
+from models import PersonalRecord, Set, User
+from tests.helpers import add_workout, edit_workout
+
+
+def _records(app, user_id):
+    with app.app_context():
+        return {
+            record.exercise_id: (record.best_weight, round(record.best_e1rm, 2), record.best_volume)
+            for record in PersonalRecord.query.filter_by(user_id=user_id)
+        }
+
+
+def _set_id(app, workout_id):
+    with app.app_context():
+        return db.session.query(Set.id).filter_by(workout_id=workout_id).scalar()
+
+
+def test_records_follow_workout_writes(app, exercises, lifter):
+    client, user_id = lifter
+    squat, bench = exercises['Squat'], exercises['Bench Press']
+
+    first = add_workout(client, '2026-10-01', (squat, 100, 5, 3))
+    assert _records(app, user_id) == {squat: (100, 116.67, 1500)}
+
+    # A heavier single takes the weight and e1RM records; the volume record stays with the first session
+    second = add_workout(client, '2026-10-03', (squat, 120, 1, 1))
+    assert _records(app, user_id) == {squat: (120, 120, 1500)}
+
+    # Deleting the record-holding workout falls back to the next best
+    assert client.post(f'/delete_workout/{second}').status_code == 302
+    assert _records(app, user_id) == {squat: (100, 116.67, 1500)}
+
+    # An edit can lower a record
+    edit_workout(client, first, '2026-10-01', (squat, 80, 5, 3, _set_id(app, first)))
+    assert _records(app, user_id) == {squat: (80, 93.33, 1200)}
+
+    # Swapping the exercise's last set for another exercise drops its record
+    edit_workout(client, first, '2026-10-01', (bench, 60, 10, 3))
+    assert _records(app, user_id) == {bench: (60, 80, 1800)}
+
+
+def test_records_endpoint_orders_by_metric(app, exercises, lifter):
+    client, user_id = lifter
+    squat = exercises['Squat']
+    add_workout(client, '2026-10-01', (squat, 140, 1, 1))
+
+    rival_client = app.test_client()
+    with app.app_context():
+        rival = User(username='rival', password_hash='x')
+        db.session.add(rival)
+        db.session.commit()
+        rival_id = rival.id
+    with rival_client.session_transaction() as session:
+        session['user_id'] = rival_id
+    add_workout(rival_client, '2026-10-01', (squat, 120, 8, 5))
+
+    def usernames(metric):
+        response = client.get(f'/records/{squat}', query_string={'metric': metric})
+        assert response.status_code == 200
+        return [record['username'] for record in response.get_json()]
+
+    assert usernames('best_weight') == ['lifter', 'rival']
+    # 120 x 8 is an e1RM of 152, and 4800 in one session
+    assert usernames('best_e1rm') == ['rival', 'lifter']
+    assert usernames('best_volume') == ['rival', 'lifter']
+
+    response = client.get(f'/records/{squat}')
+    assert [record['best_e1rm'] for record in response.get_json()] == [152.0, 140.0]
+    assert client.get(f'/records/{squat}', query_string={'metric': 'reps'}).status_code == 400
+
@@ -0,0 +1,34 @@
+import os
+import struct
+import zlib
+from extensions import db
+from jobs import work
+from models import Job
+from profile_pictures import enqueue_profile_picture, _pending_folder
+
+
+def _png_header(width, height):
+    """A tiny PNG that declares width x height pixels and has no image data."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'IEND', b'')
+
+
+def test_a_decompression_bomb_fails_at_once_and_drops_its_stash(app, lifter, tmp_path, monkeypatch):
+    _, user_id = lifter
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    with app.app_context():
+        upload_key = f'uploads/{user_id}/bomb'
+        os.makedirs(_pending_folder())
+        stash = os.path.join(_pending_folder(), 'bomb')
+        with open(stash, 'wb') as f:
+            f.write(_png_header(100_000, 100_000))
+        job_id = enqueue_profile_picture(user_id, upload_key).id
+
+        work(once=True)
+
+        job = db.session.get(Job, job_id)
+        assert (job.status, job.attempts) == ('failed', 1)
+        assert 'Could not read the image' in job.last_error
+        assert not os.path.exists(stash)
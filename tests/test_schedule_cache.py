@@ -0,0 +1,83 @@
+import threading
+from datetime import date
+from sqlalchemy import update
+from extensions import db
+from models import CacheVersion, User, WeeklyWorkout, WeeklyWorkoutDay, WorkoutTemplate
+from admin import SCHEDULE_DAYS
+
+TODAY_FIELD = dict((weekday, day) for weekday, day in SCHEDULE_DAYS)[date.today().weekday()] + '_template'
+
+
+def _setup(app, user_id):
+    with app.app_context():
+        db.session.get(User, user_id).is_admin = True
+        templates = [WorkoutTemplate(name=name, created_by=user_id) for name in ('Push Day', 'Pull Day')]
+        db.session.add_all(templates)
+        db.session.commit()
+        return [template.id for template in templates]
+
+
+def _suggested(client):
+    page = client.get('/').get_data(as_text=True)
+    for name in ('Push Day', 'Pull Day', 'Chest Day'):
+        if f"Today's Suggested Workout: {name}" in page:
+            return name
+    return None
+
+
+def test_schedule_edits_change_the_suggestion(app, lifter):
+    client, user_id = lifter
+    push_id, pull_id = _setup(app, user_id)
+    week_start = date.today().isoformat()
+
+    client.post('/admin/create_weekly_workout', data={'week_start_date': week_start, TODAY_FIELD: push_id})
+    assert _suggested(client) == 'Push Day'
+    assert _suggested(client) == 'Push Day'
+
+    with app.app_context():
+        workout_id = db.session.query(WeeklyWorkout.id).scalar()
+    client.post(f'/admin/edit_weekly_workout/{workout_id}', data={'week_start_date': week_start, TODAY_FIELD: pull_id})
+    assert _suggested(client) == 'Pull Day'
+
+    client.post(f'/admin/edit_weekly_workout/{workout_id}', data={'week_start_date': week_start, TODAY_FIELD: 'rest'})
+    assert _suggested(client) is None
+
+
+def test_a_load_between_flush_and_commit_is_not_kept(app, lifter):
+    client, user_id = lifter
+    push_id, _ = _setup(app, user_id)
+    client.post('/admin/create_weekly_workout', data={'week_start_date': date.today().isoformat(), TODAY_FIELD: push_id})
+    flushed, loaded = threading.Event(), threading.Event()
+
+    def rename():
+        with app.app_context():
+            db.session.get(WorkoutTemplate, push_id).name = 'Chest Day'
+            db.session.flush()
+            flushed.set()
+            loaded.wait()
+            db.session.commit()
+
+    writer = threading.Thread(target=rename)
+    writer.start()
+    flushed.wait()
+    assert _suggested(client) == 'Push Day'
+    loaded.set()
+    writer.join()
+
+    assert _suggested(client) == 'Chest Day'
+
+
+def test_writes_from_another_process_reach_the_cache(app, lifter):
+    client, user_id = lifter
+    push_id, pull_id = _setup(app, user_id)
+    client.post('/admin/create_weekly_workout', data={'week_start_date': date.today().isoformat(), TODAY_FIELD: push_id})
+    assert _suggested(client) == 'Push Day'
+
+    # Another worker edits the schedule; nothing runs in this process
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(update(WeeklyWorkoutDay).values(template_id=pull_id))
+            connection.execute(update(CacheVersion).where(CacheVersion.name == 'schedule')
+                               .values(version=CacheVersion.version + 1))
+
+    assert _suggested(client) == 'Pull Day'
@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Listens on every engine before app.py is imported, then reports what the import did
+PROBE = '''
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+statements, connections = [], []
+event.listen(Engine, 'before_cursor_execute', lambda conn, cursor, statement, *args: statements.append(statement))
+event.listen(Pool, 'connect', lambda *args: connections.append(1))
+import app
+print(len(statements), len(connections))
+'''
+
+
+def test_importing_the_app_touches_no_database(tmp_path):
+    env = dict(os.environ, DEVELOPMENT_DATABASE_URL=f"sqlite:///{tmp_path / 'startup.db'}")
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ['0', '0']
+    # Not even the schema: that's the release phase's job (or 'flask bootstrap')
+    assert not (tmp_path / 'startup.db').exists()
@@ -0,0 +1,70 @@
+import threading
+from datetime import datetime, timedelta
+from extensions import db
+from models import StravaAccount
+from strava_tokens import get_access_token, get_strava_client
+
+
+def _expire(app, account_id, minutes_left=1):
+    # Inside REFRESH_MARGIN, so the next call refreshes
+    with app.app_context():
+        account = db.session.get(StravaAccount, account_id)
+        account.token_expiry = datetime.now() + timedelta(minutes=minutes_left)
+        db.session.commit()
+
+
+def test_fresh_token_is_used_as_is(app, fake_strava, strava_user):
+    _, account_id = strava_user
+    with app.app_context():
+        assert get_access_token(db.session.get(StravaAccount, account_id)) == 'access-0'
+    assert fake_strava.refreshes == 0
+
+
+def test_concurrent_callers_refresh_once_and_persist_the_new_tokens(app, fake_strava, strava_user):
+    _, account_id = strava_user
+    _expire(app, account_id)
+    # A slow token endpoint keeps every caller waiting on the first refresh
+    fake_strava.token_delay = 0.2
+
+    callers = 8
+    barrier = threading.Barrier(callers)
+    tokens, errors = [], []
+
+    def call():
+        with app.app_context():
+            account = db.session.get(StravaAccount, account_id)
+            barrier.wait()
+            try:
+                tokens.append(get_access_token(account))
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert fake_strava.refreshes == 1
+    assert tokens == ['access-1'] * callers
+
+    with app.app_context():
+        account = db.session.get(StravaAccount, account_id)
+        assert account.access_token == 'access-1'
+        assert account.refresh_token == 'refresh-1'
+        assert account.token_expiry > datetime.now() + timedelta(hours=5)
+
+
+def test_api_calls_go_out_with_the_refreshed_token(app, fake_strava, strava_user):
+    _, account_id = strava_user
+    _expire(app, account_id)
+    # Only the refreshed token works from here on
+    fake_strava.valid_access_tokens.discard('access-0')
+
+    with app.app_context():
+        athlete = get_strava_client(db.session.get(StravaAccount, account_id)).get_athlete()
+
+    assert athlete.id == fake_strava.athlete_id
+    assert fake_strava.refreshes == 1
+    assert fake_strava.requests['GET /api/v3/athlete'] == 1
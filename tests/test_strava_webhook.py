@@ -0,0 +1,161 @@
+import threading
+from extensions import db
+from jobs import work, claim_next_job
+from models import Job, StravaAccount, StravaWorkout
+
+ACTIVITY_ID = 987654
+
+
+def _event(fake_strava, **fields):
+    event = {
+        'subscription_id': 42,
+        'owner_id': fake_strava.athlete_id,
+        'object_type': 'activity',
+        'object_id': ACTIVITY_ID,
+        'aspect_type': 'create',
+        'updates': {},
+        'event_time': 1760000000,
+    }
+    event.update(fields)
+    return event
+
+
+def _post(app, event):
+    return app.test_client().post('/strava/webhook', json=event)
+
+
+def _run_worker(app):
+    with app.app_context():
+        work(once=True)
+
+
+def _workouts(app, user_id):
+    with app.app_context():
+        return {w.strava_id: w.name for w in StravaWorkout.query.filter_by(user_id=user_id)}
+
+
+def test_subscription_handshake(app):
+    client = app.test_client()
+    response = client.get('/strava/webhook', query_string={
+        'hub.mode': 'subscribe', 'hub.verify_token': 'verify-token', 'hub.challenge': 'abc'
+    })
+    assert response.status_code == 200
+    assert response.get_json() == {'hub.challenge': 'abc'}
+
+    response = client.get('/strava/webhook', query_string={
+        'hub.mode': 'subscribe', 'hub.verify_token': 'wrong', 'hub.challenge': 'abc'
+    })
+    assert response.status_code == 403
+
+
+def test_events_are_refused_without_a_subscription_id(app, fake_strava, strava_user):
+    app.config['STRAVA_WEBHOOK_SUBSCRIPTION_ID'] = None
+    assert _post(app, _event(fake_strava)).status_code == 403
+    assert _post(app, _event(fake_strava, subscription_id=7)).status_code == 403
+    with app.app_context():
+        assert Job.query.count() == 0
+
+
+def test_activity_lifecycle(app, fake_strava, strava_user):
+    user_id, _ = strava_user
+    fake_strava.add_activity(ACTIVITY_ID, name='Morning Run')
+
+    # Strava retries unacknowledged events, so the same create can arrive more than once
+    for _ in range(3):
+        assert _post(app, _event(fake_strava)).status_code == 200
+    with app.app_context():
+        assert Job.query.filter_by(kind='strava_activity').count() == 1
+    _run_worker(app)
+    assert fake_strava.requests['GET /api/v3/activities/<id>'] == 1
+    assert _workouts(app, user_id) == {str(ACTIVITY_ID): 'Morning Run'}
+
+    fake_strava.activities[ACTIVITY_ID]['name'] = 'Easy Run'
+    _post(app, _event(fake_strava, aspect_type='update', updates={'title': 'Easy Run'}))
+    _run_worker(app)
+    assert _workouts(app, user_id) == {str(ACTIVITY_ID): 'Easy Run'}
+
+    # A delete event alone removes nothing; Strava has to answer 404 first
+    _post(app, _event(fake_strava, aspect_type='delete'))
+    _run_worker(app)
+    assert _workouts(app, user_id) == {str(ACTIVITY_ID): 'Easy Run'}
+
+    del fake_strava.activities[ACTIVITY_ID]
+    _post(app, _event(fake_strava, aspect_type='delete'))
+    _run_worker(app)
+    assert _workouts(app, user_id) == {}
+
+
+def test_an_update_during_a_fetch_queues_one_follow_up(app, fake_strava, strava_user):
+    user_id, _ = strava_user
+    fake_strava.add_activity(ACTIVITY_ID, name='Morning Run')
+    _post(app, _event(fake_strava))
+    claimed_meanwhile = []
+
+    def rename_after_fetch(activity_id):
+        # The running job has read the old name; the rename and its events land before it stores it
+        fake_strava.after_activity_fetch = None
+        fake_strava.activities[activity_id]['name'] = 'Easy Run'
+
+        def send_events():
+            for _ in range(2):
+                assert _post(app, _event(fake_strava, aspect_type='update')).status_code == 200
+            with app.app_context():
+                claimed_meanwhile.append(claim_next_job())
+
+        sender = threading.Thread(target=send_events)
+        sender.start()
+        sender.join()
+
+    fake_strava.after_activity_fetch = rename_after_fetch
+    _run_worker(app)
+
+    # The follow-up waited for the first fetch to finish, then ran once
+    assert claimed_meanwhile == [None]
+    assert fake_strava.requests['GET /api/v3/activities/<id>'] == 2
+    assert _workouts(app, user_id) == {str(ACTIVITY_ID): 'Easy Run'}
+    with app.app_context():
+        jobs = Job.query.filter_by(kind='strava_activity').all()
+        assert [(job.status, job.dedupe_key) for job in jobs] == [('succeeded', None)] * 2
+
+
+def test_deauthorization_is_confirmed_with_strava(app, fake_strava, strava_user):
+    user_id, account_id = strava_user
+    fake_strava.add_activity(ACTIVITY_ID)
+    _post(app, _event(fake_strava))
+    _run_worker(app)
+    deauth = _event(fake_strava, object_type='athlete', object_id=fake_strava.athlete_id,
+                    aspect_type='update', updates={'authorized': 'false'})
+
+    # Forged: our token still works, so nothing is removed
+    assert _post(app, deauth).status_code == 200
+    _run_worker(app)
+    with app.app_context():
+        assert db.session.get(StravaAccount, account_id) is not None
+    assert _workouts(app, user_id) == {str(ACTIVITY_ID): f'Activity {ACTIVITY_ID}'}
+
+    fake_strava.revoke()
+    _post(app, deauth)
+    _run_worker(app)
+    with app.app_context():
+        assert db.session.get(StravaAccount, account_id) is None
+    assert _workouts(app, user_id) == {}
+
+
+def test_events_without_an_owner_are_ignored(app, fake_strava, strava_user):
+    _, account_id = strava_user
+    # Accounts connected before webhooks existed have no athlete_id
+    with app.app_context():
+        db.session.get(StravaAccount, account_id).athlete_id = None
+        db.session.commit()
+
+    for owner_id in (None, '1234', True):
+        event = _event(fake_strava, object_type='athlete', aspect_type='update',
+                       updates={'authorized': 'false'}, owner_id=owner_id)
+        assert _post(app, event).status_code == 200
+    del_event = _event(fake_strava, aspect_type='delete')
+    del del_event['owner_id']
+    assert _post(app, del_event).status_code == 200
+
+    with app.app_context():
+        assert Job.query.count() == 0
+        assert db.session.get(StravaAccount, account_id) is not None
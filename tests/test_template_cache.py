@@ -0,0 +1,77 @@
+import threading
+from sqlalchemy import update
+from extensions import db
+from models import CacheVersion, WorkoutTemplate, WorkoutTemplateExercise
+
+
+def _make_template(app, user_id, exercise_id, name='Leg Day'):
+    with app.app_context():
+        template = WorkoutTemplate(name=name, created_by=user_id)
+        db.session.add(template)
+        db.session.add(WorkoutTemplateExercise(template=template, exercise_id=exercise_id, sets=5, reps=5))
+        db.session.commit()
+        return template.id
+
+
+def _load(client, template_id):
+    response = client.get(f'/workout_templates/load_template/{template_id}')
+    assert response.status_code == 200
+    return response.get_json()['name'], response.headers['ETag']
+
+
+def test_edits_change_the_payload_and_etag(app, exercises, lifter):
+    client, user_id = lifter
+    template_id = _make_template(app, user_id, exercises['Squat'])
+    name, etag = _load(client, template_id)
+    assert name == 'Leg Day'
+
+    response = client.get(f'/workout_templates/load_template/{template_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    response = client.post(f'/workout_templates/templates/{template_id}/edit', data={
+        'name': 'Heavy Legs', 'exercise_count': 1, 'exercise_1': exercises['Squat'], 'sets_1': 3, 'reps_1': 3
+    })
+    assert response.status_code == 302
+    new_name, new_etag = _load(client, template_id)
+    assert new_name == 'Heavy Legs'
+    assert new_etag != etag
+
+
+def test_a_load_between_flush_and_commit_is_not_kept(app, exercises, lifter):
+    client, user_id = lifter
+    template_id = _make_template(app, user_id, exercises['Squat'])
+    flushed, loaded = threading.Event(), threading.Event()
+
+    def rename():
+        with app.app_context():
+            db.session.get(WorkoutTemplate, template_id).name = 'Heavy Legs'
+            db.session.flush()
+            flushed.set()
+            loaded.wait()
+            db.session.commit()
+
+    # The request comes in after the rename is flushed and before it commits
+    writer = threading.Thread(target=rename)
+    writer.start()
+    flushed.wait()
+    assert _load(client, template_id)[0] == 'Leg Day'
+    loaded.set()
+    writer.join()
+
+    assert _load(client, template_id)[0] == 'Heavy Legs'
+
+
+def test_writes_from_another_process_reach_the_cache(app, exercises, lifter):
+    client, user_id = lifter
+    template_id = _make_template(app, user_id, exercises['Squat'])
+    assert _load(client, template_id)[0] == 'Leg Day'
+
+    # Another process renames the template; nothing runs in this one
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.execute(update(WorkoutTemplate).where(WorkoutTemplate.id == template_id)
+                               .values(name='Heavy Legs'))
+            connection.execute(update(CacheVersion).where(CacheVersion.name == 'templates')
+                               .values(version=CacheVersion.version + 1))
+
+    assert _load(client, template_id)[0] == 'Heavy Legs'
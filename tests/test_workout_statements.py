@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from extensions import db
+from models import Set, Workout
+from tests.helpers import workout_form
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+@contextmanager
+def statements(app):
+    """Collect the verb of every statement sent to the database."""
+    verbs = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        verbs.append(statement.split(None, 1)[0].upper())
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield verbs
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def _counts(verbs):
+    return len(verbs), sum(verb in WRITES for verb in verbs)
+
+
+@pytest.mark.parametrize('exercise_count', [1, 5])
+def test_statement_counts_do_not_grow_with_the_workout(app, exercises, lifter, exercise_count):
+    client, _ = lifter
+    entries = [(exercise_id, 100, 5, 3) for exercise_id in list(exercises.values())[:exercise_count]]
+
+    # User lookup; workout insert; one executemany for the sets; the leaderboard version bump;
+    # select, delete and upsert for each of the volume rollup and the personal records
+    with statements(app) as verbs:
+        assert client.post('/add_workout', data=workout_form('2026-10-01', entries)).status_code == 302
+    assert _counts(verbs) == (10, 7)
+
+    with app.app_context():
+        workout_id = db.session.query(Workout.id).scalar()
+        set_ids = [set_id for (set_id,) in db.session.query(Set.id).filter_by(workout_id=workout_id).order_by(Set.id)]
+    rows = [entry + (set_id,) for entry, set_id in zip(entries, set_ids)]
+
+    # Nothing changed: the reads, and no writes at all
+    with statements(app) as verbs:
+        assert client.post(f'/edit_workout/{workout_id}', data=workout_form('2026-10-01', rows)).status_code == 302
+    assert _counts(verbs) == (4, 0)
+
+    # One weight: a single UPDATE plus the version bump and the two refreshes
+    rows[0] = (rows[0][0], 110) + rows[0][2:]
+    with statements(app) as verbs:
+        assert client.post(f'/edit_workout/{workout_id}', data=workout_form('2026-10-01', rows)).status_code == 302
+    assert _counts(verbs) == (11, 6)
+    assert verbs.count('UPDATE') == 1
@@ -0,0 +1,74 @@
+from sqlalchemy import func, insert, tuple_
+from extensions import db, dialect_insert
+from cache_versions import bump_cache_version
+from models import DailyVolume, Workout, Set, Exercise
+
+
+def _volume_rows_query():
+    return db.session.query(
+        Workout.user_id,
+        Exercise.muscle_group,
+        Workout.date,
+        func.sum(Set.volume).label('total_volume')
+    ).select_from(Workout).join(Workout.sets).join(Set.exercise).group_by(
+        Workout.user_id, Exercise.muscle_group, Workout.date
+    )
+
+
+def refresh_daily_volume(user_id, dates):
+    """Recompute the rollup rows for one user on the given dates.
+
+    Runs inside the caller's transaction, so it must be called after the
+    workout changes are added to the session and before the commit.
+    Current rows are upserted and only (muscle group, date) pairs with no
+    sets left are deleted, so two writes for the same user at once don't
+    collide on the unique constraint. The leaderboard version is bumped in
+    the same transaction.
+    """
+    dates = {d for d in dates if d is not None}
+    if not dates:
+        return
+
+    bump_cache_version('leaderboard')
+    db.session.flush()
+
+    rows = [row._asdict() for row in _volume_rows_query().filter(
+        Workout.user_id == user_id,
+        Workout.date.in_(dates)
+    )]
+
+    stale = DailyVolume.query.filter(
+        DailyVolume.user_id == user_id,
+        DailyVolume.date.in_(dates)
+    )
+    upsert = dialect_insert(DailyVolume)
+    if upsert is None:
+        stale.delete(synchronize_session=False)
+        if rows:
+            db.session.execute(insert(DailyVolume), rows)
+        return
+
+    if rows:
+        stale = stale.filter(~tuple_(DailyVolume.muscle_group, DailyVolume.date).in_(
+            [(row['muscle_group'], row['date']) for row in rows]))
+    stale.delete(synchronize_session=False)
+    if rows:
+        upsert = upsert.values(rows)
+        db.session.execute(upsert.on_conflict_do_update(
+            index_elements=['user_id', 'muscle_group', 'date'],
+            set_={'total_volume': upsert.excluded.total_volume}
+        ))
+
+
+def rebuild_daily_volume():
+    """Recreate the whole rollup table from the raw Set rows."""
+    DailyVolume.query.delete(synchronize_session=False)
+    db.session.execute(
+        insert(DailyVolume).from_select(
+            ['user_id', 'muscle_group', 'date', 'total_volume'],
+            _volume_rows_query().statement
+        )
+    )
+    bump_cache_version('leaderboard')
+    db.session.commit()
+    return DailyVolume.query.count()
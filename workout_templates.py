@@ -1,6 +1,8 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, abort, current_app
 from extensions import db
-from models import WorkoutTemplate, WorkoutTemplateExercise, Exercise, User
+from models import WorkoutTemplate, WorkoutTemplateExercise, User
+from exercise_catalog import exercise_catalog
+from template_cache import template_cache
 
 workout_templates = Blueprint('workout_templates', __name__)
 
@@ -12,7 +14,7 @@ def list_templates():
         return redirect(url_for('login'))
     
     templates = WorkoutTemplate.query.all()
-    templates_dict = [template.to_dict() for template in templates]
+    templates_dict = WorkoutTemplate.to_dicts(templates)
     return render_template('workout_templates/list.html', templates=templates_dict)
 
 @workout_templates.route('/templates/new', methods=['GET', 'POST'])
@@ -45,7 +47,7 @@ def new_template():
         flash('Workout template created successfully', 'success')
         return redirect(url_for('workout_templates.list_templates'))
     
-    exercises = Exercise.query.all()
+    exercises = exercise_catalog.exercises()
     return render_template('workout_templates/new.html', exercises=exercises)
 
 @workout_templates.route('/templates/<int:template_id>/edit', methods=['GET', 'POST'])
@@ -86,7 +88,7 @@ def edit_template(template_id):
         flash('Workout template updated successfully', 'success')
         return redirect(url_for('workout_templates.list_templates'))
     
-    exercises = Exercise.query.all()
+    exercises = exercise_catalog.exercises()
     return render_template('workout_templates/edit.html', template=template, exercises=exercises)
 
 @workout_templates.route('/templates/<int:template_id>/delete', methods=['POST'])
@@ -108,8 +110,14 @@ def delete_template(template_id):
 
 @workout_templates.route('/load_template/<int:template_id>', methods=['GET'])
 def load_template(template_id):
-    template = WorkoutTemplate.query.get_or_404(template_id)
-    return jsonify(template.to_dict())
+    cached = template_cache.get(template_id)
+    if cached is None:
+        abort(404)
+    payload, etag = cached
+    response = current_app.response_class(payload, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 @workout_templates.route('/view/<int:template_id>')
 def view_template(template_id):